@@ -1,15 +1,88 @@
 """Integración de Activo2 para Home Assistant."""
 import logging
-from homeassistant.core import HomeAssistant
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.config_entries import ConfigEntry
-from .const import DOMAIN, PLATFORMS
-from .coordinator import Activo2Coordinator
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers.event import async_call_later
+import homeassistant.helpers.config_validation as cv
+from .const import (
+    ATTR_DURATION,
+    ATTR_MODE,
+    ATTR_REFRESHES,
+    ATTR_USERNAME,
+    DEFAULT_PROFILE_DURATION,
+    DOMAIN,
+    PLATFORMS,
+    SERVICE_PROFILE,
+    SERVICE_REFRESH_USER_INFO,
+)
+from .archive import async_acquire_archive, async_release_archive, async_remove_archived
+from .client import async_acquire_client, async_release_client
+from .coordinator import Activo2Coordinator, async_remove_cache
+from .coverage import async_setup_coverage
+from .feed import Activo2CalendarFeedView
+from .photo import Activo2PhotoView
+from .profiler import MODE_CPROFILE, MODE_SAMPLING, Activo2Profiler
 
 _LOGGER = logging.getLogger(__name__)
 
+PROFILE_SCHEMA = vol.Schema({
+    vol.Required(ATTR_USERNAME): cv.string,
+    vol.Optional(ATTR_MODE, default=MODE_CPROFILE): vol.In([MODE_CPROFILE, MODE_SAMPLING]),
+    vol.Exclusive(ATTR_REFRESHES, "limit"): vol.All(vol.Coerce(int), vol.Range(min=1)),
+    vol.Exclusive(ATTR_DURATION, "limit"): vol.All(vol.Coerce(float), vol.Range(min=1)),
+})
+
+REFRESH_USER_INFO_SCHEMA = vol.Schema({
+    vol.Required(ATTR_USERNAME): cv.string,
+})
+
+def _get_coordinator(hass: HomeAssistant, username: str) -> Activo2Coordinator:
+    """Coordinador de la cuenta indicada en la llamada a un servicio."""
+    coordinator = next(
+        (c for c in hass.data.get(DOMAIN, {}).values() if c.username == username), None
+    )
+    if coordinator is None:
+        raise ServiceValidationError(f"No Activo2 account configured for {username}")
+    return coordinator
+
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the integration from YAML (no recomendado)."""
     _LOGGER.debug("Setting up integration from YAML")
+
+    async def async_handle_profile(call: ServiceCall) -> None:
+        """Perfila una cuenta durante N refrescos o N segundos sin reiniciar HA."""
+        username = call.data[ATTR_USERNAME]
+        coordinator = _get_coordinator(hass, username)
+        if coordinator.profiler is not None:
+            raise ServiceValidationError(f"Activo2 account {username} is already being profiled")
+
+        refreshes = call.data.get(ATTR_REFRESHES)
+        duration = call.data.get(ATTR_DURATION)
+        if refreshes is None and duration is None:
+            duration = DEFAULT_PROFILE_DURATION
+        profiler = Activo2Profiler(hass, username, call.data[ATTR_MODE], refreshes, duration)
+
+        def _detach():
+            coordinator.profiler = None
+
+        profiler.on_stop = _detach
+        coordinator.profiler = profiler
+        profiler.start()
+
+    async def async_handle_refresh_user_info(call: ServiceCall) -> None:
+        """Vuelve a descargar la información de usuario sin esperar a las 24 horas."""
+        await _get_coordinator(hass, call.data[ATTR_USERNAME]).async_request_userinfo_refresh()
+
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE, async_handle_profile, PROFILE_SCHEMA)
+    hass.services.async_register(
+        DOMAIN, SERVICE_REFRESH_USER_INFO, async_handle_refresh_user_info, REFRESH_USER_INFO_SCHEMA
+    )
+    # Feed iCalendar de cada cuenta: /api/activo2/<usuario>/<workshifts|tasks|all>.ics
+    hass.http.register_view(Activo2CalendarFeedView(hass))
+    # Miniaturas de la foto de perfil: /api/activo2/photo/<token>_<tamaño>.jpg
+    hass.http.register_view(Activo2PhotoView(hass))
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
@@ -19,20 +92,59 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # Crear el coordinador de forma centralizada
     username = entry.data["username"]
     password = entry.data["password"]
-    coordinator = Activo2Coordinator(hass, username, password)
-    await coordinator.async_config_entry_first_refresh()
+    client = async_acquire_client(hass, entry.entry_id)
+    archive = async_acquire_archive(hass, entry.entry_id)
+    coordinator = Activo2Coordinator(
+        hass, username, password, dict(entry.options), entry.entry_id, client, archive
+    )
+    if await coordinator.async_load_cache():
+        # Con datos guardados no esperamos a la API: se refresca en segundo plano,
+        # con un desfase por cuenta para no llamar todas a la vez tras reiniciar
+        async def _async_startup_refresh(_now) -> None:
+            await coordinator.async_refresh()
+
+        entry.async_on_unload(async_call_later(
+            hass, coordinator.policy.startup_delay(), _async_startup_refresh
+        ))
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await async_release_client(hass, entry.entry_id)
+            await async_release_archive(hass, entry.entry_id)
+            raise
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
+    # Turnos de la cuenta en la cobertura de su tienda
+    async_setup_coverage(hass, entry, coordinator)
 
     # Reenviar la configuración a las plataformas definidas
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # Recargar la entrada cuando cambian las opciones
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     return True
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Borra los datos guardados al eliminar una entrada de configuración."""
+    await async_remove_cache(hass, entry.entry_id)
+    await async_remove_archived(hass, entry.data["username"])
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Recarga una entrada de configuración tras cambiar sus opciones."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Desmonta una entrada de configuración."""
     _LOGGER.debug("Unloading config entry %s", entry.entry_id)
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator: Activo2Coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        # Escrituras pendientes en el histórico antes de liberarlo
+        await coordinator.async_shutdown()
+        if coordinator.profiler is not None:
+            await coordinator.profiler.async_stop()
+        await async_release_client(hass, entry.entry_id)
+        await async_release_archive(hass, entry.entry_id)
     return unload_ok
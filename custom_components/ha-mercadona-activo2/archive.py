@@ -0,0 +1,244 @@
+"""Histórico en SQLite de los turnos y tareas de todas las cuentas."""
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import logging
+import sqlite3
+import threading
+
+from homeassistant.components.calendar import CalendarEvent
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_ARCHIVE, SENSOR_PREFIX
+from .models import Activo2Event, TaskEvent, Workshift
+
+_LOGGER = logging.getLogger(__name__)
+
+ARCHIVE_FILENAME = f"{SENSOR_PREFIX}_archive.db"
+# Duración máxima de un evento: acota la búsqueda por inicio
+MAX_EVENT_DURATION = timedelta(days=1)
+# Meses (por cuenta y calendario) de CalendarEvent que se mantienen en memoria
+CACHED_MONTHS = 240
+
+# uid es único por cuenta y calendario: cada horario de un día tiene el suyo,
+# así que un turno partido no sustituye a la otra parte
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS events (
+        account TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        uid TEXT NOT NULL,
+        day TEXT NOT NULL,
+        store TEXT,
+        start_ts REAL NOT NULL,
+        end_ts REAL NOT NULL,
+        summary TEXT NOT NULL,
+        location TEXT,
+        description TEXT,
+        night_shift INTEGER,
+        color TEXT,
+        priority TEXT,
+        PRIMARY KEY (account, kind, uid)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS events_start ON events (account, kind, start_ts)",
+    "CREATE INDEX IF NOT EXISTS events_day ON events (account, day)",
+    "CREATE INDEX IF NOT EXISTS events_store ON events (store, day)",
+)
+
+
+def _month(timestamp: float) -> tuple[int, int]:
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return moment.year, moment.month
+
+
+def _month_range(year: int, month: int) -> tuple[float, float]:
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start.timestamp(), end.timestamp()
+
+
+def _row(account: str, kind: str, event: Activo2Event) -> tuple:
+    return (
+        account,
+        kind,
+        event.uid,
+        event.start.date().isoformat(),
+        event.location.split(" - ", 1)[0] if event.location else None,
+        event.start.timestamp(),
+        event.end.timestamp(),
+        event.summary,
+        event.location,
+        event.description,
+        int(event.night_shift) if isinstance(event, Workshift) else None,
+        event.color if isinstance(event, TaskEvent) else None,
+        event.priority if isinstance(event, TaskEvent) else None,
+    )
+
+
+class ShiftArchive:
+    """Turnos y tareas guardados en SQLite, indexados por cuenta, fecha y tienda.
+
+    Todos los métodos sin prefijo async son bloqueantes y se llaman desde el
+    executor; una única conexión protegida con un lock sirve a todas las
+    cuentas. Las consultas por rango se resuelven por meses y los
+    CalendarEvent de cada mes se guardan en memoria hasta que se escribe en él.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        # Tras close() no se vuelve a abrir la conexión
+        self._closed = False
+        # (cuenta, calendario, año, mes) -> [(inicio, fin, CalendarEvent)]
+        self._months: OrderedDict[tuple, list] = OrderedDict()
+        self.entries: set[str] = set()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Activo2 archive is closed")
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def store(
+        self,
+        account: str,
+        kind: str,
+        events: list[Activo2Event],
+        window: tuple[datetime, datetime],
+    ) -> None:
+        """Sustituye los eventos de la ventana en vivo por los actuales.
+
+        Lo que hay fuera de la ventana se conserva: es el histórico que la
+        API ya no devuelve. Dentro de ella se borran los eventos cancelados.
+        """
+        window_start, window_end = window[0].timestamp(), window[1].timestamp()
+        rows = [_row(account, kind, event) for event in events]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "DELETE FROM events WHERE account = ? AND kind = ? AND start_ts >= ? AND start_ts < ?",
+                    (account, kind, window_start, window_end),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+            touched = {_month(row[5]) for row in rows}
+            touched.update(self._months_between(window_start, window_end))
+            for year, month in touched:
+                self._months.pop((account, kind, year, month), None)
+        _LOGGER.debug("Archived %d Activo2 %s of %s", len(rows), kind, account)
+
+    @staticmethod
+    def _months_between(start_ts: float, end_ts: float) -> list[tuple[int, int]]:
+        year, month = _month(start_ts)
+        last = _month(end_ts)
+        months = []
+        while (year, month) <= last:
+            months.append((year, month))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    def _load_month(self, account: str, kind: str, year: int, month: int) -> list:
+        key = (account, kind, year, month)
+        cached = self._months.get(key)
+        if cached is not None:
+            self._months.move_to_end(key)
+            return cached
+        month_start, month_end = _month_range(year, month)
+        rows = self._connection().execute(
+            "SELECT uid, start_ts, end_ts, summary, location, description FROM events "
+            "WHERE account = ? AND kind = ? AND start_ts >= ? AND start_ts < ? ORDER BY start_ts",
+            (account, kind, month_start, month_end),
+        ).fetchall()
+        items = []
+        for uid, start_ts, end_ts, summary, location, description in rows:
+            start = datetime.fromtimestamp(start_ts, timezone.utc)
+            end = datetime.fromtimestamp(end_ts, timezone.utc)
+            items.append((start, end, CalendarEvent(
+                start=start,
+                end=end,
+                summary=summary,
+                description=description or "",
+                location=location or "",
+                uid=uid,
+            )))
+        self._months[key] = items
+        if len(self._months) > CACHED_MONTHS:
+            self._months.popitem(last=False)
+        return items
+
+    def events(
+        self,
+        account: str,
+        kind: str,
+        start: datetime,
+        end: datetime,
+        exclude: tuple[datetime, datetime] | None = None,
+    ) -> list[CalendarEvent]:
+        """Eventos archivados que solapan con [start, end], sin los que empiezan
+        dentro de exclude (la ventana en vivo, que se sirve del índice)."""
+        result = []
+        with self._lock:
+            first = (start - MAX_EVENT_DURATION).timestamp()
+            for year, month in self._months_between(first, end.timestamp()):
+                for event_start, event_end, event in self._load_month(account, kind, year, month):
+                    if event_start > end or event_end < start:
+                        continue
+                    if exclude is not None and exclude[0] <= event_start < exclude[1]:
+                        continue
+                    result.append(event)
+        return result
+
+    def remove_account(self, account: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM events WHERE account = ?", (account,))
+            for key in [key for key in self._months if key[0] == account]:
+                del self._months[key]
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._months.clear()
+
+
+@callback
+def async_acquire_archive(hass: HomeAssistant, entry_id: str) -> ShiftArchive:
+    """Devuelve el histórico compartido, creándolo si es la primera entrada."""
+    archive: ShiftArchive | None = hass.data.get(DATA_ARCHIVE)
+    if archive is None:
+        archive = hass.data[DATA_ARCHIVE] = ShiftArchive(hass.config.path(ARCHIVE_FILENAME))
+    archive.entries.add(entry_id)
+    return archive
+
+
+async def async_release_archive(hass: HomeAssistant, entry_id: str) -> None:
+    """Libera el histórico para una entrada y lo cierra si ya no lo usa nadie."""
+    archive: ShiftArchive | None = hass.data.get(DATA_ARCHIVE)
+    if archive is None:
+        return
+    archive.entries.discard(entry_id)
+    if not archive.entries:
+        hass.data.pop(DATA_ARCHIVE)
+        await hass.async_add_executor_job(archive.close)
+
+
+async def async_remove_archived(hass: HomeAssistant, username: str) -> None:
+    """Borra el histórico de una cuenta al eliminar su entrada."""
+    archive = ShiftArchive(hass.config.path(ARCHIVE_FILENAME))
+    try:
+        await hass.async_add_executor_job(archive.remove_account, username)
+    finally:
+        await hass.async_add_executor_job(archive.close)
@@ -6,13 +6,16 @@ from datetime import datetime
 
 from homeassistant.components.calendar import CalendarEntity, CalendarEvent
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, SENSOR_PREFIX
+from .const import CONF_PRIORITY_CALENDARS, CONF_PROCESS_CALENDARS, DOMAIN, SENSOR_PREFIX
 from .coordinator import Activo2Coordinator
+from .coverage import StoreCoverage, async_get_coverage
+from .entity import Activo2Entity
+from .event_index import EventIndex
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,48 +32,93 @@ async def async_setup_entry(
         Activo2WorkshiftCalendarEntity(coordinator, username),
         Activo2TasksCalendarEntity(coordinator, username),
     ]
+    # Calendarios de tareas por proceso y prioridad elegidos en las opciones
+    processes = coordinator.task_index().processes
+    for process in entry.options.get(CONF_PROCESS_CALENDARS, []):
+        entities.append(Activo2TaskGroupCalendarEntity(
+            coordinator, username, "process", process, processes.get(process, process)
+        ))
+    for priority in entry.options.get(CONF_PRIORITY_CALENDARS, []):
+        entities.append(Activo2TaskGroupCalendarEntity(
+            coordinator, username, "priority", priority, f"priority {priority}"
+        ))
+    _async_remove_unused_groups(hass, entry, {entity.unique_id for entity in entities})
     async_add_entities(entities)
 
-class Activo2WorkshiftCalendarEntity(CoordinatorEntity, CalendarEntity):
-    """Entidad de calendario para los turnos de trabajo de Activo2."""
-    def __init__(self, coordinator: Activo2Coordinator, username: str) -> None:
+    # Cobertura de la tienda: la crea una sola de las cuentas de la tienda
+    coverage = async_get_coverage(hass, coordinator.data["userinfo"].cod_store)
+    coverage.async_add_platform(
+        "calendar", entry.entry_id, async_add_entities, Activo2StoreCoverageCalendarEntity
+    )
+
+@callback
+def _async_remove_unused_groups(hass: HomeAssistant, entry: ConfigEntry, unique_ids: set[str]) -> None:
+    """Borra del registro los calendarios de proceso o prioridad que ya no están en las opciones."""
+    registry = er.async_get(hass)
+    prefix = f"{SENSOR_PREFIX}_{entry.data['username']}_tasks_"
+    for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+        if (
+            registry_entry.domain == "calendar"
+            and registry_entry.unique_id.startswith(prefix)
+            and registry_entry.unique_id not in unique_ids
+        ):
+            registry.async_remove(registry_entry.entity_id)
+
+class Activo2CalendarEntity(Activo2Entity, CalendarEntity):
+    """Entidad de calendario base respaldada por un índice de eventos."""
+
+    # Clave de coordinator.data con los eventos del calendario
+    _events_key: str
+
+    def __init__(self, coordinator: Activo2Coordinator) -> None:
         super().__init__(coordinator)
-        self._username = username
-        self._attr_name = f"{SENSOR_PREFIX} {username} Work Shifts"
-        self._attr_unique_id = f"{SENSOR_PREFIX}_{username}_workshifts"
-        self._attr_icon = "mdi:calendar-clock"
+        # Evento actual/siguiente cacheado hasta la próxima frontera; no hace
+        # falta un temporizador: CalendarEntity ya escribe el estado al empezar
+        # y al terminar el evento y entonces se vuelve a calcular
+        self._cached_event: CalendarEvent | None = None
+        self._cached_index = None
+        self._cache_expires: datetime | None = None
 
     @property
     def available(self) -> bool:
         return (
             self.coordinator.last_update_success
             and self.coordinator.data is not None
-            and "workshifts" in self.coordinator.data
+            and self._events_key in self.coordinator.data
         )
 
+    def _index(self) -> EventIndex:
+        """Índice con los eventos del calendario."""
+        return self.coordinator.event_index(self._events_key)
+
+    @callback
+    def _update_cached_event(self) -> None:
+        """Calcula el evento actual, válido hasta la siguiente frontera."""
+        index = self._index()
+        self._cached_event, self._cache_expires = index.lookup(dt_util.utcnow())
+        self._cached_index = index
+
     @property
     def native_event(self) -> CalendarEvent | None:
+        """Evento en curso o, si no hay ninguno, el próximo."""
         if not self.available:
             return None
+        if (
+            self._cached_index is not self._index()
+            or (self._cache_expires is not None and dt_util.utcnow() >= self._cache_expires)
+        ):
+            self._update_cached_event()
+        return self._cached_event
 
-        now = dt_util.now()
-        for event in self.coordinator.data["workshifts"]:
-            event_start = dt_util.as_utc(dt_util.parse_datetime(event["start"]))
-            event_end = dt_util.as_utc(dt_util.parse_datetime(event["end"]))
-            if event_start <= now <= event_end:
-                return CalendarEvent(
-                    start=event_start,
-                    end=event_end,
-                    summary=event["summary"],
-                    description=event.get("description", ""),
-                    location=event.get("location", ""),
-                    uid=event["uid"],
-                )
-        return None
+    @property
+    def extra_state_attributes(self):
+        if not self.available:
+            return None
+        return {"stale": self.coordinator.data.get("stale", False)}
 
     @property
     def event(self) -> CalendarEvent | None:
-        """Soporte legacy: devuelve el evento actual."""
+        """Soporte legacy: devuelve el evento actual o el próximo."""
         return self.native_event
 
     async def async_get_events(
@@ -79,28 +127,25 @@ class Activo2WorkshiftCalendarEntity(CoordinatorEntity, CalendarEntity):
         """Devuelve eventos dentro de un rango de fechas."""
         if not self.available:
             return []
+        return await self.coordinator.async_get_events(self._events_key, start_date, end_date)
+
+class Activo2WorkshiftCalendarEntity(Activo2CalendarEntity):
+    """Entidad de calendario para los turnos de trabajo de Activo2."""
+    _events_key = "workshifts"
+    _data_keys = ("workshifts", "stale")
+
+    def __init__(self, coordinator: Activo2Coordinator, username: str) -> None:
+        super().__init__(coordinator)
+        self._username = username
+        self._attr_name = f"{SENSOR_PREFIX} {username} Work Shifts"
+        self._attr_unique_id = f"{SENSOR_PREFIX}_{username}_workshifts"
+        self._attr_icon = "mdi:calendar-clock"
 
-        start_date = dt_util.as_utc(start_date)
-        end_date = dt_util.as_utc(end_date)
-        events = []
-        for event in self.coordinator.data["workshifts"]:
-            event_start = dt_util.as_utc(dt_util.parse_datetime(event["start"]))
-            event_end = dt_util.as_utc(dt_util.parse_datetime(event["end"]))
-            if event_start <= end_date and event_end >= start_date:
-                events.append(
-                    CalendarEvent(
-                        start=event_start,
-                        end=event_end,
-                        summary=event["summary"],
-                        description=event.get("description", ""),
-                        location=event.get("location", ""),
-                        uid=event["uid"],
-                    )
-                )
-        return events
-
-class Activo2TasksCalendarEntity(CoordinatorEntity, CalendarEntity):
+class Activo2TasksCalendarEntity(Activo2CalendarEntity):
     """Entidad de calendario para las tareas de Activo2."""
+    _events_key = "tasks"
+    _data_keys = ("tasks", "stale")
+
     def __init__(self, coordinator: Activo2Coordinator, username: str) -> None:
         super().__init__(coordinator)
         self._username = username
@@ -108,60 +153,76 @@ class Activo2TasksCalendarEntity(CoordinatorEntity, CalendarEntity):
         self._attr_unique_id = f"{SENSOR_PREFIX}_{username}_tasks"
         self._attr_icon = "mdi:calendar-check"
 
-    @property
-    def available(self) -> bool:
-        return (
-            self.coordinator.last_update_success
-            and self.coordinator.data is not None
-            and "tasks" in self.coordinator.data
-        )
+class Activo2TaskGroupCalendarEntity(Activo2CalendarEntity):
+    """Tareas de un proceso o de una prioridad, servidas desde su propio índice.
 
-    @property
-    def native_event(self) -> CalendarEvent | None:
+    Solo cubre la ventana que devuelve la API: el histórico no guarda el proceso.
+    """
+    _events_key = "tasks"
+    _data_keys = ("tasks", "stale")
+
+    def __init__(
+        self, coordinator: Activo2Coordinator, username: str, group: str, value: str, label: str
+    ) -> None:
+        super().__init__(coordinator)
+        self._username = username
+        self._group = group
+        self._value = value
+        self._attr_name = f"{SENSOR_PREFIX} {username} Tasks {label}"
+        self._attr_unique_id = f"{SENSOR_PREFIX}_{username}_tasks_{group}_{value}"
+        self._attr_icon = "mdi:calendar-filter"
+
+    def _index(self) -> EventIndex:
+        task_index = self.coordinator.task_index()
+        if self._group == "process":
+            return task_index.process(self._value)
+        return task_index.priority(self._value)
+
+    async def async_get_events(
+        self, hass: HomeAssistant, start_date: datetime, end_date: datetime
+    ) -> List[CalendarEvent]:
+        """Tareas del proceso o prioridad dentro del rango."""
         if not self.available:
-            return None
+            return []
+        with self.coordinator.profiled():
+            return self._index().between(start_date, end_date)
+
+class Activo2StoreCoverageCalendarEntity(CalendarEntity):
+    """Tramos con personal en turno en una tienda y quién está en cada uno."""
+
+    _attr_should_poll = False
+    _attr_icon = "mdi:store-clock"
+
+    def __init__(self, coverage: StoreCoverage) -> None:
+        self._coverage = coverage
+        self._attr_name = f"{SENSOR_PREFIX} store {coverage.cod_store} Coverage"
+        self._attr_unique_id = f"{SENSOR_PREFIX}_store_{coverage.cod_store}_coverage"
+        # Tramo actual/siguiente hasta la próxima frontera; como en los demás
+        # calendarios, CalendarEntity escribe el estado en sus inicios y fines
+        self._event: CalendarEvent | None = None
+        self._expires: datetime | None = None
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self._coverage.async_add_listener(self._handle_coverage_update))
+        self._update_event()
 
-        now = dt_util.now()
-        for event in self.coordinator.data["tasks"]:
-            event_start = dt_util.as_utc(dt_util.parse_datetime(event["start"]))
-            event_end = dt_util.as_utc(dt_util.parse_datetime(event["end"]))
-            if event_start <= now <= event_end:
-                return CalendarEvent(
-                    start=event_start,
-                    end=event_end,
-                    summary=event["summary"],
-                    description=event.get("description", ""),
-                    location=event.get("location", ""),
-                    uid=event["uid"],
-                )
-        return None
+    @callback
+    def _update_event(self) -> None:
+        self._event, self._expires = self._coverage.event_at(dt_util.utcnow())
+
+    @callback
+    def _handle_coverage_update(self) -> None:
+        self._update_event()
+        self.async_write_ha_state()
 
     @property
     def event(self) -> CalendarEvent | None:
-        return self.native_event
+        if self._expires is not None and dt_util.utcnow() >= self._expires:
+            self._update_event()
+        return self._event
 
     async def async_get_events(
         self, hass: HomeAssistant, start_date: datetime, end_date: datetime
     ) -> List[CalendarEvent]:
-        """Devuelve eventos dentro de un rango de fechas."""
-        if not self.available:
-            return []
-
-        start_date = dt_util.as_utc(start_date)
-        end_date = dt_util.as_utc(end_date)
-        events = []
-        for event in self.coordinator.data["tasks"]:
-            event_start = dt_util.as_utc(dt_util.parse_datetime(event["start"]))
-            event_end = dt_util.as_utc(dt_util.parse_datetime(event["end"]))
-            if event_start <= end_date and event_end >= start_date:
-                events.append(
-                    CalendarEvent(
-                        start=event_start,
-                        end=event_end,
-                        summary=event["summary"],
-                        description=event.get("description", ""),
-                        location=event.get("location", ""),
-                        uid=event["uid"],
-                    )
-                )
-        return events
+        """Tramos con alguien en turno dentro del rango."""
+        return self._coverage.between(start_date, end_date)
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""Cliente HTTP compartido por todas las cuentas de Activo2."""
+from __future__ import annotations
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession, async_get_clientsession
+
+from .const import DATA_CLIENT
+from .lib.activo2 import Activo2API, CircuitBreaker, HostLimiter, SingleFlight
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Activo2Client:
+    """Sesión aiohttp con un único pool de conexiones y un límite de
+    peticiones simultáneas por host para todas las entradas de configuración."""
+
+    def __init__(self, hass: HomeAssistant, **api_kwargs) -> None:
+        # Argumentos extra de Activo2API (p. ej. sts_base_url/api_base_url de pruebas)
+        self._api_kwargs = api_kwargs
+        # La sesión se cierra al descargar la última entrada, no al parar HA
+        self.session = async_create_clientsession(hass, auto_cleanup=False)
+        self.limiter = HostLimiter()
+        # Un backend caído se deja de llamar desde todas las cuentas a la vez
+        self.breaker = CircuitBreaker()
+        # Tokens y peticiones en curso compartidos: dos entradas con el mismo
+        # usuario no repiten login ni descargas simultáneas
+        self.flights = SingleFlight()
+        self.tokens = None
+        self.tokens = self.create_api().tokens
+        self.entries: set[str] = set()
+
+    def create_api(self) -> Activo2API:
+        return Activo2API(
+            self.session, self.limiter, self.tokens, self.flights, self.breaker, **self._api_kwargs
+        )
+
+    async def async_close(self) -> None:
+        """Suelta la sesión al descargar la última entrada.
+
+        Con auto_cleanup=False HA no la suelta sola y su conector es el
+        compartido de HA: close() lo cerraría para todos (y HA lo avisa como
+        error), así que se usa detach().
+        """
+        self.session.detach()
+
+
+@callback
+def async_acquire_client(hass: HomeAssistant, entry_id: str) -> Activo2Client:
+    """Devuelve el cliente compartido, creándolo si es la primera entrada."""
+    client: Activo2Client | None = hass.data.get(DATA_CLIENT)
+    if client is None:
+        client = hass.data[DATA_CLIENT] = Activo2Client(hass)
+        _LOGGER.debug("Created shared Activo2 HTTP client")
+    client.entries.add(entry_id)
+    return client
+
+
+async def async_release_client(hass: HomeAssistant, entry_id: str) -> None:
+    """Libera el cliente para una entrada y lo cierra si ya no lo usa nadie."""
+    client: Activo2Client | None = hass.data.get(DATA_CLIENT)
+    if client is None:
+        return
+    client.entries.discard(entry_id)
+    if not client.entries:
+        hass.data.pop(DATA_CLIENT)
+        await client.async_close()
+        _LOGGER.debug("Closed shared Activo2 HTTP client")
+
+
+@callback
+def async_get_api(hass: HomeAssistant) -> Activo2API:
+    """API para usos puntuales (config flow) sin crear sesiones nuevas."""
+    client: Activo2Client | None = hass.data.get(DATA_CLIENT)
+    if client is not None:
+        return client.create_api()
+    return Activo2API(async_get_clientsession(hass))
@@ -3,11 +3,35 @@ import logging
 from typing import Any
 import voluptuous as vol
 from homeassistant import config_entries, exceptions
-from homeassistant.core import HomeAssistant
-from .const import DOMAIN  # pylint:disable=unused-import
+from homeassistant.core import HomeAssistant, callback
+from .const import (  # pylint:disable=unused-import
+    DOMAIN,
+    CONF_SCAN_INTERVAL,
+    CONF_FAST_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_PUBLISH_WEEKDAY,
+    CONF_PUBLISH_START_HOUR,
+    CONF_PUBLISH_END_HOUR,
+    CONF_SHIFT_LEAD_TIME,
+    CONF_NIGHT_START_HOUR,
+    CONF_NIGHT_END_HOUR,
+    CONF_JITTER,
+    CONF_PROCESS_CALENDARS,
+    CONF_PRIORITY_CALENDARS,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_FAST_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_PUBLISH_WEEKDAY,
+    DEFAULT_PUBLISH_START_HOUR,
+    DEFAULT_PUBLISH_END_HOUR,
+    DEFAULT_SHIFT_LEAD_TIME,
+    DEFAULT_NIGHT_START_HOUR,
+    DEFAULT_NIGHT_END_HOUR,
+    DEFAULT_JITTER,
+)
 from .lib.activo2 import *
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from .client import async_get_api
 from homeassistant.data_entry_flow import FlowHandler, FlowResult
 from homeassistant.const import (
     CONF_USERNAME,
@@ -32,6 +56,12 @@ class Activo2ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Initialize the config flow."""
         super().__init__()
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry):
+        """Devuelve el flujo de opciones."""
+        return Activo2OptionsFlow()
+
     async def async_step_user(self, user_input=None):
         """Maneja el paso de entrada de usuario."""
         errors = {}
@@ -78,8 +108,7 @@ class Activo2ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         Data tiene las claves de USER_DATA_SCHEMA con valores proporcionados por el usuario.
         """
-        session = async_create_clientsession(hass)
-        api = Activo2API(session)
+        api = async_get_api(hass)
         try:
             id_token = await api.login(data[CONF_USERNAME], data[CONF_PASSWORD])
             if id_token is not None:
@@ -91,6 +120,62 @@ class Activo2ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             raise CannotConnect from exception
 
 
+def _options_schema(options: dict, processes: dict[str, str], priorities: list[str]) -> vol.Schema:
+    """Schema de opciones con los valores actuales como predeterminados."""
+    # Se mantienen las opciones elegidas aunque ya no aparezcan en el calendario
+    process_choices = {process: f"{process} - {name}" for process, name in sorted(processes.items())}
+    for process in options.get(CONF_PROCESS_CALENDARS, []):
+        process_choices.setdefault(process, process)
+    priority_choices = {priority: priority for priority in sorted({*priorities, *options.get(CONF_PRIORITY_CALENDARS, [])})}
+    minutes = vol.All(vol.Coerce(int), vol.Range(min=1, max=1440))
+    hour = vol.All(vol.Coerce(int), vol.Range(min=0, max=23))
+    return vol.Schema({
+        vol.Required(CONF_SCAN_INTERVAL, default=options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)): minutes,
+        vol.Required(CONF_FAST_INTERVAL, default=options.get(CONF_FAST_INTERVAL, DEFAULT_FAST_INTERVAL)): minutes,
+        vol.Required(CONF_MAX_INTERVAL, default=options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL)): minutes,
+        vol.Required(CONF_PUBLISH_WEEKDAY, default=options.get(CONF_PUBLISH_WEEKDAY, DEFAULT_PUBLISH_WEEKDAY)):
+            vol.All(vol.Coerce(int), vol.Range(min=0, max=6)),
+        vol.Required(CONF_PUBLISH_START_HOUR, default=options.get(CONF_PUBLISH_START_HOUR, DEFAULT_PUBLISH_START_HOUR)): hour,
+        vol.Required(CONF_PUBLISH_END_HOUR, default=options.get(CONF_PUBLISH_END_HOUR, DEFAULT_PUBLISH_END_HOUR)): hour,
+        vol.Required(CONF_SHIFT_LEAD_TIME, default=options.get(CONF_SHIFT_LEAD_TIME, DEFAULT_SHIFT_LEAD_TIME)):
+            vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+        vol.Required(CONF_NIGHT_START_HOUR, default=options.get(CONF_NIGHT_START_HOUR, DEFAULT_NIGHT_START_HOUR)): hour,
+        vol.Required(CONF_NIGHT_END_HOUR, default=options.get(CONF_NIGHT_END_HOUR, DEFAULT_NIGHT_END_HOUR)): hour,
+        vol.Required(CONF_JITTER, default=options.get(CONF_JITTER, DEFAULT_JITTER)):
+            vol.All(vol.Coerce(int), vol.Range(min=0, max=60)),
+        vol.Optional(CONF_PROCESS_CALENDARS, default=options.get(CONF_PROCESS_CALENDARS, [])):
+            cv.multi_select(process_choices),
+        vol.Optional(CONF_PRIORITY_CALENDARS, default=options.get(CONF_PRIORITY_CALENDARS, [])):
+            cv.multi_select(priority_choices),
+    })
+
+
+class Activo2OptionsFlow(config_entries.OptionsFlow):
+    """Flujo de opciones para la política de refresco de Activo2."""
+
+    async def async_step_init(self, user_input=None):
+        """Maneja las opciones de refresco."""
+        errors = {}
+        if user_input is not None:
+            # El intervalo rápido no puede superar al normal ni este al máximo
+            if user_input[CONF_FAST_INTERVAL] <= user_input[CONF_SCAN_INTERVAL] <= user_input[CONF_MAX_INTERVAL]:
+                return self.async_create_entry(title="", data=user_input)
+            errors["base"] = "invalid_intervals"
+
+        # Procesos y prioridades del calendario actual, si la cuenta está cargada
+        processes, priorities = {}, []
+        coordinator = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+        if coordinator is not None and coordinator.data is not None:
+            task_index = coordinator.task_index()
+            processes, priorities = task_index.processes, list(task_index.by_priority)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=_options_schema({**self.config_entry.options, **(user_input or {})}, processes, priorities),
+            errors=errors,
+        )
+
+
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
 
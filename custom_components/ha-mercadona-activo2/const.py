@@ -5,5 +5,55 @@ from homeassistant.const import Platform
 # name for the integration.
 DOMAIN = "ha-mercadona-activo2"
 SENSOR_PREFIX = 'activo2'
+# Clave de hass.data con el cliente HTTP compartido
+DATA_CLIENT = f"{DOMAIN}_client"
+# Clave de hass.data con el histórico SQLite compartido
+DATA_ARCHIVE = f"{DOMAIN}_archive"
+# Clave de hass.data con la cobertura de personal por tienda
+DATA_COVERAGE = f"{DOMAIN}_coverage"
+# Eventos del bus al cambiar el calendario
+EVENT_WORKSHIFT_ADDED = f"{SENSOR_PREFIX}_workshift_added"
+EVENT_WORKSHIFT_CHANGED = f"{SENSOR_PREFIX}_workshift_changed"
+EVENT_WORKSHIFT_REMOVED = f"{SENSOR_PREFIX}_workshift_removed"
+EVENT_TASK_ADDED = f"{SENSOR_PREFIX}_task_added"
+EVENT_TASK_CHANGED = f"{SENSOR_PREFIX}_task_changed"
+EVENT_TASK_REMOVED = f"{SENSOR_PREFIX}_task_removed"
+# Señal del dispatcher con las métricas de cada refresco (se formatea con el usuario)
+SIGNAL_METRICS_UPDATED = f"{DOMAIN}_metrics_{{}}"
+# Servicio de perfilado bajo demanda
+SERVICE_PROFILE = "profile"
+ATTR_USERNAME = "username"
+ATTR_MODE = "mode"
+ATTR_REFRESHES = "refreshes"
+ATTR_DURATION = "duration"
+DEFAULT_PROFILE_DURATION = 60
+# Servicio para volver a descargar la información de usuario (tienda, foto)
+SERVICE_REFRESH_USER_INFO = "refresh_user_info"
 # Plataformas soportadas
-PLATFORMS = [Platform.SENSOR, Platform.CALENDAR, Platform.IMAGE]
\ No newline at end of file
+PLATFORMS = [Platform.SENSOR, Platform.CALENDAR, Platform.IMAGE]
+# Opciones de la política de refresco del calendario
+CONF_SCAN_INTERVAL = "scan_interval"
+CONF_FAST_INTERVAL = "fast_interval"
+CONF_MAX_INTERVAL = "max_interval"
+CONF_PUBLISH_WEEKDAY = "publish_weekday"
+CONF_PUBLISH_START_HOUR = "publish_start_hour"
+CONF_PUBLISH_END_HOUR = "publish_end_hour"
+CONF_SHIFT_LEAD_TIME = "shift_lead_time"
+CONF_NIGHT_START_HOUR = "night_start_hour"
+CONF_NIGHT_END_HOUR = "night_end_hour"
+CONF_JITTER = "jitter"
+# Calendarios de tareas opcionales por proceso y por prioridad
+CONF_PROCESS_CALENDARS = "process_calendars"
+CONF_PRIORITY_CALENDARS = "priority_calendars"
+
+# Valores por defecto (intervalos en minutos, horas en hora local)
+DEFAULT_SCAN_INTERVAL = 60
+DEFAULT_FAST_INTERVAL = 15
+DEFAULT_MAX_INTERVAL = 180
+DEFAULT_PUBLISH_WEEKDAY = 3  # Jueves
+DEFAULT_PUBLISH_START_HOUR = 8
+DEFAULT_PUBLISH_END_HOUR = 20
+DEFAULT_SHIFT_LEAD_TIME = 120
+DEFAULT_NIGHT_START_HOUR = 0
+DEFAULT_NIGHT_END_HOUR = 6
+DEFAULT_JITTER = 5
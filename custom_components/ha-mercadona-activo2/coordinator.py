@@ -1,135 +1,755 @@
 """Data coordinator for Activo2 integration."""
-from datetime import timedelta
+import asyncio
+from contextlib import nullcontext
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
 import logging
+import sqlite3
 from zoneinfo import ZoneInfo
 
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.components.calendar import CalendarEvent
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.exceptions import ConfigEntryAuthFailed
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
 from homeassistant.util import dt as dt_util
-from datetime import datetime
-from .lib.activo2 import Activo2API
-from .lib.scheduleDTO import ScheduleResponse
-from .lib.userinfoDTO import UserDTO
+from .archive import ShiftArchive
+from .client import Activo2Client
+from .const import (
+    DOMAIN,
+    EVENT_TASK_ADDED,
+    EVENT_TASK_CHANGED,
+    EVENT_TASK_REMOVED,
+    EVENT_WORKSHIFT_ADDED,
+    EVENT_WORKSHIFT_CHANGED,
+    EVENT_WORKSHIFT_REMOVED,
+    SIGNAL_METRICS_UPDATED,
+)
+from .diff import EventDiff, diff_events
+from .event_index import EventIndex, TaskIndex
+from .hours import HoursAggregator
+from .lib.activo2 import (
+    Activo2API,
+    Activo2AuthError,
+    Activo2ConnectionError,
+    Activo2ResponseError,
+    SingleFlight,
+)
+from .lib.scheduleDTO import LeanScheduleResponse
+from .metrics import RefreshMetrics
+from .models import Activo2Event, TaskEvent, UserInfo, Workshift, estimate_size, intern
+from .photo import PhotoCache
+from .profiler import Activo2Profiler
+from .scheduler import SchedulePolicy
 
 _LOGGER = logging.getLogger(__name__)
 
-# Intervalo de actualización de datos
-UPDATE_INTERVAL = timedelta(minutes=60)
+# La información de usuario (tienda, departamento, foto) casi nunca cambia
+USERINFO_INTERVAL = timedelta(hours=24)
+# Tiempo máximo de espera de la información de usuario si ya tenemos una anterior
+USERINFO_TIMEOUT = 15
 
-def get_user_offset(cod_company):
-    if cod_company == "08":
-        timezone = ZoneInfo("Europe/Madrid")
-    elif cod_company == "09":
-        timezone = ZoneInfo("Europe/Lisbon")
-    else:
-        timezone = ZoneInfo("Europe/Madrid")
-        _LOGGER.warning(f"Unknown company code: {cod_company}. Using Europe/Madrid as default.")
+# Errores de red o de respuesta de la API con los que se mantienen los datos
+# anteriores; cualquier otro es un fallo de la integración y se propaga
+API_ERRORS = (Activo2ConnectionError, Activo2ResponseError, asyncio.TimeoutError)
 
-    # Get current time in the specified timezone
-    now = datetime.now(timezone)
+# Copia en disco del último calendario descargado; 2: tareas con process_id y abbreviation
+STORAGE_VERSION = 2
+STORAGE_SAVE_DELAY = 10
 
-    # Format the offset
-    offset = now.strftime("%z")
-    # Convert from +0100 to +01:00 format
-    if offset:
-        offset = f"{offset[:3]}:{offset[3:]}"
+# Zona horaria de cada empresa (cod_company)
+COMPANY_TIMEZONES = {
+    "08": "Europe/Madrid",
+    "09": "Europe/Lisbon",
+}
+DEFAULT_TIMEZONE = "Europe/Madrid"
 
-    return offset
+
+@lru_cache(maxsize=None)
+def get_user_timezone(cod_company) -> ZoneInfo:
+    """ZoneInfo de la empresa del usuario, cacheada por cod_company."""
+    name = COMPANY_TIMEZONES.get(cod_company)
+    if name is None:
+        _LOGGER.warning(f"Unknown company code: {cod_company}. Using {DEFAULT_TIMEZONE} as default.")
+        name = DEFAULT_TIMEZONE
+    return ZoneInfo(name)
+
+
+@lru_cache(maxsize=None)
+def _parse_day(value: str) -> date:
+    return date.fromisoformat(value)
+
+
+@lru_cache(maxsize=None)
+def _parse_hour(value: str) -> tuple[int, int]:
+    """Convierte "HH:MM" en (horas, minutos); admite "24:00"."""
+    hours, minutes = value.split(":")[:2]
+    return int(hours), int(minutes)
+
+
+def build_interval(day: date, start: str, end: str, timezone: ZoneInfo) -> tuple[datetime, datetime]:
+    """Inicio y fin con zona horaria de un tramo "HH:MM"-"HH:MM" del día indicado.
+
+    Si el fin es anterior o igual al inicio, el tramo termina al día siguiente
+    (turnos de noche que cruzan la medianoche).
+    """
+    start_hour, start_minute = _parse_hour(start)
+    end_hour, end_minute = _parse_hour(end)
+    start_dt = datetime.combine(day, datetime.min.time(), timezone) + timedelta(
+        hours=start_hour, minutes=start_minute
+    )
+    end_dt = datetime.combine(day, datetime.min.time(), timezone) + timedelta(
+        hours=end_hour, minutes=end_minute
+    )
+    if end_dt <= start_dt:
+        end_dt += timedelta(days=1)
+    return start_dt, end_dt
+
+
+def schedule_window(schedule_data: LeanScheduleResponse, timezone: ZoneInfo) -> tuple[datetime, datetime] | None:
+    """Rango [inicio, fin) de los días que incluye la respuesta del calendario."""
+    days = [
+        day.date
+        for month in schedule_data.months or ()
+        for week in month.weeks
+        for day in week.days
+    ]
+    if not days:
+        return None
+    start = datetime.combine(_parse_day(min(days)), datetime.min.time(), timezone)
+    end = datetime.combine(_parse_day(max(days)) + timedelta(days=1), datetime.min.time(), timezone)
+    return start, end
+
+
+class _CacheStore(Store):
+    """Copia en disco de los datos de una cuenta, con migración entre versiones."""
+
+    async def _async_migrate_func(self, old_major_version, old_minor_version, old_data):
+        if old_major_version < 2:
+            # Las tareas de la versión 1 no tienen proceso ni abreviatura: se
+            # descartan y, sin huella, el primer refresco vuelve a generarlas
+            old_data = {**old_data, "tasks": None, "fingerprint": None}
+        return old_data
+
+
+def _cache_store(hass: HomeAssistant, entry_id: str) -> Store:
+    return _CacheStore(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+
+
+async def async_remove_cache(hass: HomeAssistant, entry_id: str) -> None:
+    """Borra la copia en disco (calendario y foto) de una entrada de configuración."""
+    await _cache_store(hass, entry_id).async_remove()
+    await PhotoCache.async_remove(hass, entry_id)
+
+
+class EndpointState:
+    """Estado de refresco de un endpoint de la API de Activo2.
+
+    Sin interval se descarga en cada refresco; con él, solo cuando toca o
+    cuando se fuerza (servicio refresh_user_info).
+    """
+
+    def __init__(self, interval: timedelta | None = None):
+        self.interval = interval
+        self.last_attempt: datetime | None = None
+        self.last_success: datetime | None = None
+        self.last_error: str | None = None
+        self.force = False
+
+    def is_due(self, now: datetime) -> bool:
+        return (
+            self.force
+            or self.last_success is None
+            or self.interval is None
+            or now - self.last_success >= self.interval
+        )
+
+    def mark_success(self, now: datetime):
+        self.last_attempt = now
+        self.last_success = now
+        self.last_error = None
+        self.force = False
+
+    def mark_failure(self, now: datetime, err: Exception):
+        self.last_attempt = now
+        self.last_error = str(err) or type(err).__name__
+
+    def as_dict(self) -> dict:
+        """Estado para los diagnósticos."""
+        return {
+            "interval": str(self.interval) if self.interval else None,
+            "last_attempt": self.last_attempt.isoformat() if self.last_attempt else None,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_error": self.last_error,
+            "force": self.force,
+        }
 
 
 class Activo2Coordinator(DataUpdateCoordinator):
     """Coordinator to manage Activo2 data updates."""
 
-    def __init__(self, hass: HomeAssistant, username: str, password: str):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        username: str,
+        password: str,
+        options: dict | None = None,
+        entry_id: str | None = None,
+        client: Activo2Client | None = None,
+        archive: ShiftArchive | None = None,
+    ):
         """Initialize the coordinator."""
+        self.policy = SchedulePolicy(options or {}, username)
         super().__init__(
             hass,
             _LOGGER,
             name="Activo2",
-            update_interval=UPDATE_INTERVAL,
+            update_interval=self.policy.scan_interval,
+            # Sin cambios en los datos no se notifica a las entidades
+            always_update=False,
         )
 
         self.username = username
         self.password = password
-        self.session = async_create_clientsession(hass)
-        self.api = Activo2API(self.session)
+        if client is not None:
+            self.session = client.session
+            self.api = client.create_api()
+        else:
+            self.session = async_create_clientsession(hass)
+            self.api = Activo2API(self.session)
+        # La validación del calendario también se perfila
+        self.api.validation_context = self.profiled
         self.id_token = None
+        # Duración de cada fase del refresco, tamaños y número de eventos
+        self.metrics = RefreshMetrics()
+        self.metrics_signal = SIGNAL_METRICS_UPDATED.format(username)
+        # Cada endpoint se refresca con su propia cadencia
+        self.endpoints = {
+            "userinfo": EndpointState(USERINFO_INTERVAL),
+            # El calendario sigue la política adaptativa (update_interval)
+            "schedule": EndpointState(),
+        }
+        # Refrescos seguidos en los que el calendario no ha cambiado
+        self.unchanged_count = 0
+        # ETag, Last-Modified o hash de la última respuesta del calendario
+        self.schedule_fingerprint = None
+        # Último cambio en los turnos o tareas (DTSTAMP del feed iCalendar)
+        self.schedule_changed: datetime | None = None
+        # Tamaño aproximado en bytes de self.data
+        self.memory_usage = 0
+        # Claves de self.data que cambiaron en el último refresco
+        self.changed_keys: set[str] = {"userinfo", "photo", "workshifts", "tasks", "hours", "stale"}
+        # Índices de eventos por clave de datos ("workshifts", "tasks")
+        self._indexes: dict[str, EventIndex] = {}
+        # Tareas por proceso y prioridad, derivadas del índice de tareas
+        self._task_index: TaskIndex | None = None
+        self._store = _cache_store(hass, entry_id) if entry_id else None
+        # Histórico de eventos que ya no devuelve la API
+        self.archive = archive
+        # Días [inicio, fin) que cubre el último calendario descargado
+        self.live_window: tuple[datetime, datetime] | None = None
+        # Se escribe al menos una vez por arranque, aunque no haya cambios
+        self._archive_synced = False
+        # Hay tareas anteriores con las que comparar (no tras migrar la copia en disco)
+        self._tasks_known = True
+        # Escrituras pendientes en el histórico, en orden y una a una por cuenta
+        self._archive_tasks: set[asyncio.Task] = set()
+        self._archive_lock = asyncio.Lock()
+        # Horas trabajadas por semana, mes y año
+        self.hours = HoursAggregator()
+        # Foto de perfil guardada en disco con sus miniaturas; se descarga en
+        # segundo plano, después de publicar los datos del refresco
+        self.photo = PhotoCache(hass, self.session, entry_id or username)
+        self._photo_url: str | None = None
+        self._photo_task: asyncio.Task | None = None
+        # Refrescos solapados (manual, recarga, programado) comparten uno solo
+        self._refresh_flight = SingleFlight()
+        # Sesión de perfilado activa (servicio profile)
+        self.profiler: Activo2Profiler | None = None
+
+    async def async_load_cache(self) -> bool:
+        """Carga el último calendario guardado en disco.
+
+        Devuelve True si había una copia válida; los datos quedan marcados
+        como antiguos (stale) hasta el siguiente refresco correcto.
+        """
+        if self._store is None:
+            return False
+        try:
+            stored = await self._store.async_load()
+            if not stored:
+                return False
+            # None en una copia migrada: las tareas llegan con el primer refresco
+            stored_tasks = stored["tasks"]
+            data = {
+                "userinfo": UserInfo(**stored["userinfo"]),
+                "workshifts": [Workshift.from_dict(event) for event in stored["workshifts"]],
+                "tasks": [TaskEvent.from_dict(event) for event in stored_tasks or ()],
+                "stale": True,
+            }
+            hours = HoursAggregator.from_dict(stored.get("hours") or {})
+            window = stored.get("window")
+            window = tuple(datetime.fromisoformat(value) for value in window) if window else None
+            changed = stored.get("changed")
+            changed = datetime.fromisoformat(changed) if changed else None
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("Ignoring invalid Activo2 cache for %s: %s", self.username, err)
+            return False
+
+        self.schedule_fingerprint = stored.get("fingerprint")
+        self._tasks_known = stored_tasks is not None
+        self.schedule_changed = changed
+        self.live_window = window
+        self.hours = hours
+        timezone = get_user_timezone(data["userinfo"].cod_company)
+        data["hours"] = hours.totals(dt_util.now(timezone).date())
+        await self.photo.async_load()
+        data["photo"] = self.photo.token
+        self.data = data
+        self.memory_usage = estimate_size(data)
+        _LOGGER.debug("Loaded cached Activo2 data for %s", self.username)
+        return True
+
+    @callback
+    def _cache_payload(self) -> dict:
+        data = self.data
+        return {
+            "fingerprint": self.schedule_fingerprint,
+            "changed": self.schedule_changed.isoformat() if self.schedule_changed else None,
+            "window": [value.isoformat() for value in self.live_window] if self.live_window else None,
+            "hours": self.hours.as_dict(),
+            "userinfo": asdict(data["userinfo"]),
+            "workshifts": [asdict(event) for event in data["workshifts"]],
+            "tasks": [asdict(event) for event in data["tasks"]],
+        }
+
+    def data_changed(self, keys) -> bool:
+        """Indica si alguna de las claves cambió en el último refresco."""
+        return not self.changed_keys.isdisjoint(keys)
+
+    @callback
+    def _fire_diff_events(self, diff: EventDiff, added: str, changed: str, removed: str) -> None:
+        """Lanza en el bus un evento por cada turno o tarea añadido, cambiado o eliminado."""
+        bus = self.hass.bus
+        for event in diff.added:
+            bus.async_fire(added, self._event_data(event))
+        for previous, event in diff.changed:
+            data = self._event_data(event)
+            data["previous_start"] = previous.start.isoformat()
+            data["previous_end"] = previous.end.isoformat()
+            bus.async_fire(changed, data)
+        for event in diff.removed:
+            bus.async_fire(removed, self._event_data(event))
+
+    def _event_data(self, event: Activo2Event) -> dict:
+        return {
+            "username": self.username,
+            "uid": event.uid,
+            "summary": event.summary,
+            "start": event.start.isoformat(),
+            "end": event.end.isoformat(),
+            "location": event.location,
+        }
+
+    def event_index(self, key: str) -> EventIndex:
+        """Índice de los eventos de self.data[key], reconstruido solo si cambian."""
+        events = self.data[key]
+        index = self._indexes.get(key)
+        if index is None or index.source is not events:
+            with self.profiled():
+                index = self._indexes[key] = EventIndex(events)
+        return index
+
+    def task_index(self) -> TaskIndex:
+        """Tareas agrupadas por proceso y prioridad, reconstruidas con el índice de tareas."""
+        index = self.event_index("tasks")
+        if self._task_index is None or self._task_index.base is not index:
+            with self.profiled():
+                self._task_index = TaskIndex(index)
+        return self._task_index
+
+    def profiled(self):
+        """Perfila un bloque síncrono si hay una sesión de perfilado activa.
+
+        Nunca debe envolver un await: el perfil recogería todo lo que el
+        event loop ejecute mientras tanto.
+        """
+        profiler = self.profiler
+        return profiler.track() if profiler is not None else nullcontext()
+
+    async def async_get_events(self, key: str, start: datetime, end: datetime) -> list[CalendarEvent]:
+        """Eventos de self.data[key] en el rango; fuera de la ventana en vivo
+        se completan con el histórico."""
+        with self.profiled():
+            events = self.event_index(key).between(start, end)
+        window = self.live_window
+        if self.archive is None or window is None or (start >= window[0] and end <= window[1]):
+            return events
+        try:
+            archived = await self.hass.async_add_executor_job(
+                self.archive.events, self.username, key, start, end, window
+            )
+        except sqlite3.Error as err:
+            _LOGGER.warning("Error reading Activo2 archive: %s", err)
+            return events
+        return archived + events
+
+    async def _async_archive(self, workshifts, tasks, window) -> None:
+        """Guarda los eventos en el histórico en una sola escritura por calendario."""
+        # El lock es FIFO: dos refrescos seguidos escriben en el orden en que terminaron
+        async with self._archive_lock:
+            try:
+                await self.hass.async_add_executor_job(self.archive.store, self.username, "workshifts", workshifts, window)
+                await self.hass.async_add_executor_job(self.archive.store, self.username, "tasks", tasks, window)
+            except sqlite3.Error as err:
+                _LOGGER.warning("Error writing Activo2 archive: %s", err)
+
+    async def async_shutdown(self) -> None:
+        """Detiene los refrescos y espera a las escrituras pendientes en el histórico.
+
+        No se cancelan: el hilo del executor seguiría escribiendo después de
+        cerrar el histórico.
+        """
+        await super().async_shutdown()
+        if self._photo_task is not None:
+            self._photo_task.cancel()
+        if self._archive_tasks:
+            await asyncio.gather(*self._archive_tasks, return_exceptions=True)
+
+    async def async_request_userinfo_refresh(self):
+        """Fuerza la descarga de la información de usuario (servicio refresh_user_info)."""
+        self.endpoints["userinfo"].force = True
+        await self.async_request_refresh()
+
+    async def _async_timed_call(self, name, method):
+        """Llama a la API midiendo cuánto tarda la llamada."""
+        with self.metrics.measure(name):
+            return await self.api.tokens.call(self.username, self.password, method)
 
     async def _async_update_data(self):
         """Fetch data from API."""
+        # Con una sesión de perfilado solo se miden las fases síncronas (validación,
+        # transformación, diff, índices), no las esperas de red
+        profiler = self.profiler
         try:
-            # Iniciar sesión para obtener token
-            self.id_token = await self.api.login(self.username, self.password)
+            data = await self._refresh_flight.run("update", self._async_measured_fetch)
+        finally:
+            if profiler is not None:
+                profiler.refresh_done()
+        # Sin await hasta que DataUpdateCoordinator guarda data: la foto se
+        # descarga siempre con los datos ya publicados
+        self._async_start_photo_update()
+        return data
+
+    @callback
+    def _async_start_photo_update(self) -> None:
+        """Lanza la descarga pendiente de la foto si no hay otra en curso."""
+        url = self._photo_url
+        if url is None or (self._photo_task is not None and not self._photo_task.done()):
+            return
+        self._photo_url = None
+        self._photo_task = self.hass.async_create_background_task(
+            self._async_update_photo(url), f"{DOMAIN} photo {self.username}"
+        )
 
+    async def _async_update_photo(self, url: str) -> None:
+        """Descarga la foto; hasta que llega, las entidades siguen con el token actual."""
+        with self.metrics.measure("photo"):
+            updated = await self.photo.async_update(url)
+        if not updated or not self.data or self.data.get("photo") == self.photo.token:
+            return
+        # Solo cambia la foto: se avisa a las entidades sin reprogramar el refresco
+        self.changed_keys = {"photo"}
+        self.data = {**self.data, "photo": self.photo.token}
+        self.async_update_listeners()
+
+    async def _async_measured_fetch(self):
+        """Refresco completo medido; avisa a los sensores de métricas aunque
+        los datos no cambien (entonces no se notifica a los listeners)."""
+        self.metrics.start_refresh()
+        try:
+            with self.metrics.measure("total"):
+                return await self._async_fetch_data()
+        finally:
+            async_dispatcher_send(self.hass, self.metrics_signal)
+
+    async def _async_fetch_data(self):
+        """Descarga y transforma los datos de la cuenta."""
+        try:
+            # Obtener token (cacheado hasta poco antes de que caduque); el login
+            # solo se mide cuando se hace de verdad
+            self.id_token = self.api.tokens.cached_token(self.username)
             if self.id_token is None:
-                raise ConfigEntryAuthFailed("Failed to authenticate with Activo2 with username = " + self.username)
-
-            # Obtener información del usuario
-            user_info : UserDTO = await self.api.getUserInfo(self.id_token)
-
-            # Get timezone and time offset from company
-            user_offset = get_user_offset(user_info.cod_company)
-
-            # Obtener datos completos del calendario
-            schedule_data : ScheduleResponse = await self.api.getFullDaysData(self.id_token)
-
-            # Procesar los datos del calendario para adaptarlos al formato de calendario
-            workshifts = []
-            tasks = []
-
-            if schedule_data and schedule_data.months:
-                for month in schedule_data.months:
-                    for week in month.weeks:
-                        for day in week.days:
-                            if day.hasTasks and day.detail:
-                                for detail in day.detail:
-                                    # Procesar el horario general
-                                    # Ensure date format is ISO 8601 with timezone
-                                    start_time = f"{day.date}T{detail.schedule.start}:00{user_offset}"
-                                    end_time = f"{day.date}T{detail.schedule.end}:00{user_offset}"
-
-                                    # Crear evento para el turno completo
-                                    workshifts.append({
-                                        "uid": f"workshift_{day.date}",
-                                        "summary": f"Turno en {detail.store.name}",
-                                        "start": start_time,
-                                        "end": end_time,
-                                        "location": f"{detail.store.codeLabel} - {detail.store.name}",
-                                        "description": f"Turno de trabajo: {detail.schedule.total} horas",
-                                        "night_shift": detail.schedule.nightShift,
-                                        "night_shift_label": detail.schedule.nightShiftLabel
-                                    })
-
-                                    # Procesar tareas individuales
-                                    for task in detail.taskList:
-                                        # Ensure date format is ISO 8601 with timezone
-                                        task_start = f"{day.date}T{task.startHour}:00{user_offset}"
-                                        task_end = f"{day.date}T{task.endHour}:00{user_offset}"
-
-                                        tasks.append({
-                                            "uid": f"task_{day.date}_{task.processId}",
-                                            "summary": task.name,
-                                            "start": task_start,
-                                            "end": task_end,
-                                            "location": f"{detail.store.codeLabel} - {detail.store.name}",
-                                            "description": task.description,
-                                            "color": task.colour,
-                                            "priority": task.priority
-                                        })
+                with self.metrics.measure("login"):
+                    self.id_token = await self.api.tokens.get_token(self.username, self.password)
+
+            previous = self.data or {}
+            now = dt_util.utcnow()
+            userinfo_state = self.endpoints["userinfo"]
+            schedule_state = self.endpoints["schedule"]
+
+            # El calendario solo se valida si ha cambiado desde el último refresco
+            fingerprint = self.schedule_fingerprint if "workshifts" in previous else None
+            calls = {"schedule": self._async_timed_call(
+                "schedule", partial(self.api.getFullDaysDataIfChanged, fingerprint=fingerprint)
+            )}
+            # Información de usuario solo cuando toca; si ya tenemos una anterior
+            # se limita su espera para no bloquear el calendario
+            if "userinfo" not in previous:
+                calls["userinfo"] = self._async_timed_call("userinfo", self.api.getUserInfo)
+            elif userinfo_state.is_due(now):
+                calls["userinfo"] = asyncio.wait_for(
+                    self._async_timed_call("userinfo", self.api.getUserInfo),
+                    USERINFO_TIMEOUT,
+                )
+
+            # Ambas llamadas en paralelo: no dependen entre sí
+            self.api.stats.clear()
+            with self.metrics.measure("fetch"):
+                results = dict(zip(
+                    calls,
+                    await asyncio.gather(*calls.values(), return_exceptions=True),
+                ))
+            # Descarga y validación del calendario por separado (si lo descargó esta cuenta)
+            for phase in ("schedule_download", "schedule_parse"):
+                if phase in self.api.stats:
+                    self.metrics.record(phase, self.api.stats[phase])
+            if "schedule_bytes" in self.api.stats:
+                self.metrics.sizes["schedule_bytes"] = self.api.stats["schedule_bytes"]
+            _LOGGER.debug("Activo2 %s fetch timings: %s", self.username, self.metrics.timings)
+
+            for result in results.values():
+                # Credenciales o fallos que no son de red/respuesta (errores de
+                # validación, bugs) no se tapan con los datos anteriores
+                if isinstance(result, BaseException) and not isinstance(result, API_ERRORS):
+                    raise result
+
+            user_result = results.get("userinfo")
+            if user_result is None:
+                user_info : UserInfo = previous["userinfo"]
+            elif isinstance(user_result, API_ERRORS):
+                userinfo_state.mark_failure(now, user_result)
+                # Si falla solo la información de usuario, reutilizamos la anterior
+                if "userinfo" not in previous:
+                    raise user_result
+                _LOGGER.warning("Error fetching Activo2 user info, using previous data: %r", user_result)
+                user_info : UserInfo = previous["userinfo"]
+            else:
+                userinfo_state.mark_success(now)
+                user_info = UserInfo.from_dto(user_result)
+                if user_info == previous.get("userinfo"):
+                    user_info = previous["userinfo"]
+
+            # Foto de perfil: al renovar la información de usuario o si aún no la
+            # tenemos; se descarga al terminar el refresco (_async_start_photo_update)
+            if self.photo.token is None or (
+                user_result is not None and not isinstance(user_result, API_ERRORS)
+            ):
+                self._photo_url = user_info.photo
+            photo = self.photo.token
+
+            # Zona horaria de la empresa del usuario
+            user_timezone = get_user_timezone(user_info.cod_company)
+
+            schedule_result = results["schedule"]
+            if isinstance(schedule_result, API_ERRORS):
+                schedule_state.mark_failure(now, schedule_result)
+                # Si falla solo el calendario, mantenemos los eventos anteriores
+                if "workshifts" not in previous:
+                    raise schedule_result
+                _LOGGER.warning("Error fetching Activo2 schedule, using previous data: %r", schedule_result)
+                workshifts = previous["workshifts"]
+                tasks = previous["tasks"]
+                stale = True
+            else:
+                stale = False
+                schedule_state.mark_success(now)
+                schedule_data, self.schedule_fingerprint = schedule_result
+                if schedule_data is None:
+                    # Mismo calendario: ni validación ni transformación
+                    workshifts = previous["workshifts"]
+                    tasks = previous["tasks"]
+                    self.unchanged_count += 1
+                else:
+                    with self.metrics.measure("transform"), self.profiled():
+                        workshifts, tasks = self._transform_schedule(schedule_data, user_timezone)
+                    window = schedule_window(schedule_data, user_timezone)
+                    with self.metrics.measure("aggregate"), self.profiled():
+                        # Solo se recalculan las semanas que han cambiado
+                        self.hours.update(schedule_data)
+                        self.hours.prune(dt_util.now(user_timezone).date())
+                    with self.metrics.measure("diff"), self.profiled():
+                        workshift_diff = diff_events(previous.get("workshifts"), workshifts)
+                        task_diff = diff_events(previous.get("tasks"), tasks)
+                    # Con el mismo contenido se conservan las listas anteriores (e índices)
+                    if not workshift_diff and "workshifts" in previous:
+                        workshifts = previous["workshifts"]
+                    if not task_diff and "tasks" in previous:
+                        tasks = previous["tasks"]
+                    if workshift_diff or task_diff:
+                        self.unchanged_count = 0
+                        self.schedule_changed = now
+                    else:
+                        self.unchanged_count += 1
+                    if self.archive is not None and window is not None and (
+                        workshift_diff or task_diff or window != self.live_window or not self._archive_synced
+                    ):
+                        # Escritura en el executor, sin esperarla
+                        self._archive_synced = True
+                        task = self.hass.async_create_background_task(
+                            self._async_archive(workshifts, tasks, window), f"{DOMAIN} archive {self.username}"
+                        )
+                        self._archive_tasks.add(task)
+                        task.add_done_callback(self._archive_tasks.discard)
+                    self.live_window = window
+                    # Sin datos anteriores no hay cambios que avisar
+                    if "workshifts" in previous:
+                        self._fire_diff_events(
+                            workshift_diff, EVENT_WORKSHIFT_ADDED, EVENT_WORKSHIFT_CHANGED, EVENT_WORKSHIFT_REMOVED
+                        )
+                        if self._tasks_known:
+                            self._fire_diff_events(
+                                task_diff, EVENT_TASK_ADDED, EVENT_TASK_CHANGED, EVENT_TASK_REMOVED
+                            )
+                    self._tasks_known = True
+
+            # Totales del periodo actual: cambian también al cambiar de día
+            hours = self.hours.totals(dt_util.now(user_timezone).date())
+            if hours == previous.get("hours"):
+                hours = previous["hours"]
+
+            self.metrics.counts["workshifts"] = len(workshifts)
+            self.metrics.counts["tasks"] = len(tasks)
+
+            # Siguiente refresco según la política adaptativa
+            self.update_interval = self.policy.next_interval(now, workshifts, self.unchanged_count)
+            _LOGGER.debug("Next Activo2 refresh for %s in %s", self.username, self.update_interval)
+
+            if (
+                user_info is previous.get("userinfo")
+                and photo == previous.get("photo")
+                and workshifts is previous.get("workshifts")
+                and tasks is previous.get("tasks")
+                and hours is previous.get("hours")
+                and stale == previous.get("stale")
+            ):
+                # Devolver el mismo objeto evita notificar a las entidades
+                return self.data
+
+            self.changed_keys = {
+                key for key, value in (
+                    ("userinfo", user_info),
+                    ("photo", photo),
+                    ("workshifts", workshifts),
+                    ("tasks", tasks),
+                    ("hours", hours),
+                    ("stale", stale),
+                )
+                if key not in previous or previous[key] is not value
+            }
 
             # Combinar datos
             data = {}
-            data.update({'userinfo': user_info})
+            data.update({'userinfo': user_info, 'photo': photo})
             data.update({
                 'workshifts': workshifts,
-                'tasks': tasks
+                'tasks': tasks,
+                'hours': hours,
+                'stale': stale,
             })
+            self.memory_usage = estimate_size(data)
+            _LOGGER.debug("Activo2 %s data uses about %d bytes", self.username, self.memory_usage)
+
+            if self._store is not None and not stale:
+                # Se guarda pasados unos segundos, cuando data ya es self.data
+                self._store.async_delay_save(self._cache_payload, STORAGE_SAVE_DELAY)
 
             return data
 
-        except Exception as err:
-            _LOGGER.exception("Error fetching Activo2 data: %s", err)
-            raise
+        except Activo2AuthError as err:
+            raise ConfigEntryAuthFailed(str(err)) from err
+        except API_ERRORS as err:
+            if self.data:
+                # Sin conexión: seguimos mostrando los últimos datos, marcados como antiguos
+                _LOGGER.warning("Error fetching Activo2 data, keeping previous data as stale: %s", err)
+                if self.data.get("stale"):
+                    return self.data
+                self.changed_keys = {"stale"}
+                return {**self.data, "stale": True}
+            raise UpdateFailed(f"Error fetching Activo2 data: {err}") from err
+
+    @staticmethod
+    def _transform_schedule(schedule_data: LeanScheduleResponse, user_timezone: ZoneInfo):
+        """Convierte la respuesta del calendario en listas de turnos y tareas."""
+        # Procesar los datos del calendario para adaptarlos al formato de calendario
+        workshifts = []
+        tasks = []
+        # Textos compartidos por todos los eventos de una misma tienda
+        locations = {}
+        summaries = {}
+
+        if schedule_data and schedule_data.months:
+            for month in schedule_data.months:
+                for week in month.weeks:
+                    for day in week.days:
+                        if day.hasTasks and day.detail:
+                            day_date = _parse_day(day.date)
+                            for ordinal, detail in enumerate(day.detail):
+                                # Un día puede tener varios horarios (turno partido o dos
+                                # tiendas): a partir del segundo, el uid lleva su posición
+                                uid_day = f"{day.date}_{ordinal}" if ordinal else day.date
+                                # Procesar el horario general
+                                start_time, end_time = build_interval(
+                                    day_date, detail.schedule.start, detail.schedule.end, user_timezone
+                                )
+
+                                # Crear evento para el turno completo
+                                location = locations.get(detail.store.codeLabel)
+                                if location is None:
+                                    location = locations[detail.store.codeLabel] = intern(
+                                        f"{detail.store.codeLabel} - {detail.store.name}"
+                                    )
+                                    summaries[detail.store.codeLabel] = intern(f"Turno en {detail.store.name}")
+                                workshifts.append(Workshift(
+                                    uid=f"workshift_{uid_day}",
+                                    summary=summaries[detail.store.codeLabel],
+                                    start=start_time,
+                                    end=end_time,
+                                    location=location,
+                                    description=intern(f"Turno de trabajo: {detail.schedule.total} horas"),
+                                    night_shift=detail.schedule.nightShift,
+                                    night_shift_label=intern(detail.schedule.nightShiftLabel),
+                                ))
+
+                                # Procesar tareas individuales: en un turno que cruza la
+                                # medianoche, las tareas que empiezan antes que el turno
+                                # son del día siguiente
+                                shift_start = _parse_hour(detail.schedule.start)
+                                overnight = _parse_hour(detail.schedule.end) <= shift_start
+                                next_day = day_date + timedelta(days=1)
+                                for task in detail.taskList:
+                                    task_day = (
+                                        next_day if overnight and _parse_hour(task.startHour) < shift_start
+                                        else day_date
+                                    )
+                                    task_start, task_end = build_interval(
+                                        task_day, task.startHour, task.endHour, user_timezone
+                                    )
+
+                                    tasks.append(TaskEvent(
+                                        uid=f"task_{uid_day}_{task.processId}",
+                                        summary=intern(task.name),
+                                        start=task_start,
+                                        end=task_end,
+                                        location=location,
+                                        description=intern(task.description),
+                                        color=intern(task.colour),
+                                        priority=intern(task.priority),
+                                        process_id=intern(task.processId),
+                                        abbreviation=intern(task.abbreviation),
+                                    ))
 
+        return workshifts, tasks
@@ -0,0 +1,275 @@
+"""Cobertura de personal por tienda a partir de los turnos de varias cuentas."""
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from collections.abc import Callable
+from datetime import datetime
+import logging
+
+from homeassistant.components.calendar import CalendarEvent
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_COVERAGE
+from .coordinator import Activo2Coordinator
+from .models import Workshift
+
+_LOGGER = logging.getLogger(__name__)
+
+EMPTY: frozenset[str] = frozenset()
+
+
+def _merge(intervals: list[tuple[datetime, datetime]]) -> list[tuple[datetime, datetime]]:
+    """Une los intervalos solapados de una misma cuenta."""
+    merged: list[list[datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class StoreCoverage:
+    """Quién está en turno en una tienda en cada momento.
+
+    Es una línea de barrido sobre los inicios y fines de los turnos de todas
+    las cuentas de la tienda: _points son las fronteras ordenadas y _who[i]
+    las cuentas en turno entre _points[i] y _points[i + 1]. Al refrescar una
+    cuenta solo se recorre el tramo entre su primera y su última frontera
+    (antiguas o nuevas) y solo se actualiza su presencia en cada tramo.
+    """
+
+    def __init__(self, cod_store: str) -> None:
+        self.cod_store = cod_store
+        # username -> nombre a mostrar
+        self.names: dict[str, str] = {}
+        self._intervals: dict[str, list[tuple[datetime, datetime]]] = {}
+        # frontera -> {username: +1 al empezar / -1 al terminar}
+        self._changes: dict[datetime, Counter] = {}
+        self._points: list[datetime] = []
+        self._who: list[frozenset[str]] = []
+        self._listeners: list[Callable[[], None]] = []
+        # Entidades de la tienda: las crea una de las entradas de la tienda
+        self._owners: dict[str, str] = {}
+        self._adders: dict[str, dict[str, tuple[Callable, Callable]]] = {}
+        self._entities: dict[str, list] = {}
+
+    def _add_change(self, point: datetime, username: str, delta: int) -> None:
+        changes = self._changes.get(point)
+        if changes is None:
+            changes = self._changes[point] = Counter()
+            index = bisect_left(self._points, point)
+            self._points.insert(index, point)
+            # Una frontera nueva parte el tramo anterior: mismas cuentas
+            self._who.insert(index, self._who[index - 1] if index else EMPTY)
+        changes[username] += delta
+        if not changes[username]:
+            del changes[username]
+        if not changes:
+            del self._changes[point]
+            index = bisect_left(self._points, point)
+            del self._points[index]
+            del self._who[index]
+
+    def update(self, username: str, name: str, intervals: list[tuple[datetime, datetime]]) -> bool:
+        """Sustituye los turnos de una cuenta; devuelve True si algo cambió."""
+        if not self._replace(username, name, intervals):
+            return False
+        self._notify()
+        return True
+
+    def _replace(self, username: str, name: str, intervals: list[tuple[datetime, datetime]]) -> bool:
+        intervals = _merge(intervals)
+        old = self._intervals.get(username, [])
+        renamed = self.names.get(username) != name
+        self.names[username] = name
+        if old == intervals and not renamed:
+            return False
+        if intervals:
+            self._intervals[username] = intervals
+        else:
+            self._intervals.pop(username, None)
+
+        touched = old + intervals
+        if touched:
+            for start, end in old:
+                self._add_change(start, username, -1)
+                self._add_change(end, username, 1)
+            for start, end in intervals:
+                self._add_change(start, username, 1)
+                self._add_change(end, username, -1)
+            self._sweep(username, intervals, min(start for start, _ in touched), max(end for _, end in touched))
+        return True
+
+    def _sweep(self, username: str, intervals: list[tuple[datetime, datetime]], low: datetime, high: datetime) -> None:
+        """Recorre las fronteras entre low y high: solo puede cambiar la
+        presencia de username, el resto de cuentas se mantiene."""
+        first = bisect_left(self._points, low)
+        last = bisect_right(self._points, high)
+        position = 0
+        for index in range(first, last):
+            point = self._points[index]
+            while position < len(intervals) and intervals[position][1] <= point:
+                position += 1
+            on_shift = position < len(intervals) and intervals[position][0] <= point
+            who = self._who[index]
+            if on_shift != (username in who):
+                self._who[index] = who | {username} if on_shift else who - {username}
+
+    def remove(self, username: str) -> None:
+        if username not in self.names:
+            return
+        self._replace(username, self.names[username], [])
+        del self.names[username]
+        self._notify()
+
+    @property
+    def members(self) -> int:
+        return len(self.names)
+
+    def at(self, moment: datetime) -> tuple[frozenset[str], datetime | None]:
+        """Cuentas en turno en el instante y la próxima frontera."""
+        index = bisect_right(self._points, moment) - 1
+        who = self._who[index] if index >= 0 else EMPTY
+        boundary = self._points[index + 1] if index + 1 < len(self._points) else None
+        return who, boundary
+
+    def _event(self, index: int) -> CalendarEvent:
+        who = self._who[index]
+        return CalendarEvent(
+            start=self._points[index],
+            end=self._points[index + 1],
+            summary=f"{len(who)} en turno",
+            description=", ".join(sorted(self.names.get(user, user) for user in who)),
+            uid=f"coverage_{self.cod_store}_{self._points[index].isoformat()}",
+        )
+
+    def event_at(self, moment: datetime) -> tuple[CalendarEvent | None, datetime | None]:
+        """Tramo con personal en curso (o el siguiente) y la frontera en la que cambia."""
+        index = bisect_right(self._points, moment) - 1
+        if index >= 0 and self._who[index]:
+            return self._event(index), self._points[index + 1]
+        for i in range(index + 1, len(self._points) - 1):
+            if self._who[i]:
+                return self._event(i), self._points[i]
+        return None, None
+
+    def between(self, start: datetime, end: datetime) -> list[CalendarEvent]:
+        """Tramos con alguien en turno que solapan con [start, end]."""
+        start = dt_util.as_utc(start)
+        end = dt_util.as_utc(end)
+        first = max(bisect_right(self._points, start) - 1, 0)
+        last = bisect_left(self._points, end)
+        return [self._event(i) for i in range(first, min(last, len(self._points) - 1)) if self._who[i]]
+
+    @callback
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        for listener in list(self._listeners):
+            listener()
+
+    @callback
+    def _create(self, platform: str, entry_id: str) -> None:
+        async_add_entities, factory = self._adders[platform][entry_id]
+        self._owners[platform] = entry_id
+        entities = self._entities[platform] = [factory(self)]
+        async_add_entities(entities)
+
+    @callback
+    def async_add_platform(self, platform: str, entry_id: str, async_add_entities, factory) -> None:
+        """Registra cómo crear las entidades de la tienda (factory(coverage))
+        desde una entrada; solo la primera las crea."""
+        self._adders.setdefault(platform, {})[entry_id] = (async_add_entities, factory)
+        if platform not in self._owners:
+            self._create(platform, entry_id)
+
+    async def async_release(self, entry_id: str, remove: bool = False) -> dict[str, tuple[Callable, Callable]]:
+        """La entrada deja la tienda (se descarga o cambia de tienda): si creó las
+        entidades pasan a otra entrada de la tienda.
+
+        Al descargar la entrada HA ya las quitó con sus plataformas; al cambiar
+        de tienda siguen añadidas y se quitan aquí (remove=True). Devuelve cómo
+        creaba la entrada sus entidades, por plataforma.
+        """
+        released = {}
+        for platform, adders in self._adders.items():
+            if entry_id in adders:
+                released[platform] = adders.pop(entry_id)
+            if self._owners.get(platform) != entry_id:
+                continue
+            del self._owners[platform]
+            entities = self._entities.pop(platform, ())
+            try:
+                if remove:
+                    for entity in entities:
+                        await entity.async_remove()
+            finally:
+                # Aunque falle la retirada, la tienda no se queda sin entidades
+                if adders:
+                    self._create(platform, next(iter(adders)))
+        return released
+
+
+@callback
+def async_get_coverage(hass: HomeAssistant, cod_store: str) -> StoreCoverage:
+    stores: dict[str, StoreCoverage] = hass.data.setdefault(DATA_COVERAGE, {})
+    coverage = stores.get(cod_store)
+    if coverage is None:
+        coverage = stores[cod_store] = StoreCoverage(cod_store)
+    return coverage
+
+
+@callback
+def async_setup_coverage(hass: HomeAssistant, entry: ConfigEntry, coordinator: Activo2Coordinator) -> None:
+    """Mantiene los turnos de la cuenta en la cobertura de su tienda."""
+    current: dict = {"store": None, "workshifts": None, "userinfo": None}
+
+    @callback
+    def _update() -> None:
+        data = coordinator.data
+        if not data:
+            return
+        user_info = data["userinfo"]
+        workshifts: list[Workshift] = data["workshifts"]
+        if workshifts is current["workshifts"] and user_info is current["userinfo"]:
+            return
+        if current["store"] is not None and current["store"] != user_info.cod_store:
+            # Cambio de tienda: sus entidades pasan a la nueva si aún no las tiene
+            old = async_get_coverage(hass, current["store"])
+            old.remove(coordinator.username)
+            hass.async_create_task(_async_move(old, async_get_coverage(hass, user_info.cod_store)))
+        current.update(store=user_info.cod_store, workshifts=workshifts, userinfo=user_info)
+        async_get_coverage(hass, user_info.cod_store).update(
+            coordinator.username,
+            f"{user_info.name} {user_info.lastname}",
+            [(dt_util.as_utc(event.start), dt_util.as_utc(event.end)) for event in workshifts],
+        )
+
+    @callback
+    def _drop_if_empty(coverage: StoreCoverage) -> None:
+        stores = hass.data.get(DATA_COVERAGE, {})
+        if not coverage.members and stores.get(coverage.cod_store) is coverage:
+            del stores[coverage.cod_store]
+
+    async def _async_move(old: StoreCoverage, new: StoreCoverage) -> None:
+        released = await old.async_release(entry.entry_id, remove=True)
+        _drop_if_empty(old)
+        for platform, (async_add_entities, factory) in released.items():
+            new.async_add_platform(platform, entry.entry_id, async_add_entities, factory)
+
+    async def _async_remove() -> None:
+        if current["store"] is None:
+            return
+        coverage = async_get_coverage(hass, current["store"])
+        coverage.remove(coordinator.username)
+        await coverage.async_release(entry.entry_id)
+        _drop_if_empty(coverage)
+
+    _update()
+    entry.async_on_unload(coordinator.async_add_listener(_update))
+    entry.async_on_unload(_async_remove)
@@ -0,0 +1,36 @@
+"""Diagnósticos de la integración de Activo2."""
+from __future__ import annotations
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import Activo2Coordinator
+
+# El título y el unique_id de la entrada también llevan el usuario
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, "title", "unique_id"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Devuelve los diagnósticos de una entrada de configuración."""
+    coordinator: Activo2Coordinator = hass.data[DOMAIN][entry.entry_id]
+    data = coordinator.data or {}
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "update_interval": str(coordinator.update_interval),
+        # Últimos valores e histogramas de los últimos refrescos
+        "metrics": coordinator.metrics.as_dict(),
+        # Último intento, éxito y error de cada endpoint de la API
+        "endpoints": {name: state.as_dict() for name, state in coordinator.endpoints.items()},
+        "memory": {
+            "bytes": coordinator.memory_usage,
+            "workshifts": len(data.get("workshifts", ())),
+            "tasks": len(data.get("tasks", ())),
+        },
+    }
@@ -0,0 +1,34 @@
+"""Diferencias entre dos versiones del calendario de Activo2."""
+from __future__ import annotations
+from dataclasses import dataclass, field
+
+from .models import Activo2Event
+
+
+@dataclass(slots=True)
+class EventDiff:
+    """Eventos añadidos, modificados (anterior, nuevo) y eliminados, por uid."""
+    added: list[Activo2Event] = field(default_factory=list)
+    changed: list[tuple[Activo2Event, Activo2Event]] = field(default_factory=list)
+    removed: list[Activo2Event] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def diff_events(old: list[Activo2Event] | None, new: list[Activo2Event]) -> EventDiff:
+    """Compara dos listas de eventos usando su uid como clave."""
+    result = EventDiff()
+    if old is new:
+        return result
+    old_by_uid = {event.uid: event for event in old or ()}
+    new_uids = set()
+    for event in new:
+        new_uids.add(event.uid)
+        previous = old_by_uid.get(event.uid)
+        if previous is None:
+            result.added.append(event)
+        elif previous != event:
+            result.changed.append((previous, event))
+    result.removed = [event for uid, event in old_by_uid.items() if uid not in new_uids]
+    return result
@@ -0,0 +1,26 @@
+"""Entidad base de la integración de Activo2."""
+from __future__ import annotations
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .coordinator import Activo2Coordinator
+
+
+class Activo2Entity(CoordinatorEntity[Activo2Coordinator]):
+    """Entidad que solo se actualiza cuando cambia su parte de coordinator.data."""
+
+    # Claves de coordinator.data de las que depende la entidad
+    _data_keys: tuple[str, ...] = ()
+
+    def __init__(self, coordinator: Activo2Coordinator) -> None:
+        super().__init__(coordinator)
+        self._was_available: bool | None = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        available = self.available
+        if available == self._was_available and not self.coordinator.data_changed(self._data_keys):
+            return
+        self._was_available = available
+        super()._handle_coordinator_update()
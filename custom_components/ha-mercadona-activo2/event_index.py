@@ -0,0 +1,137 @@
+"""Índice ordenado de eventos para las consultas de rango de los calendarios."""
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable
+from datetime import datetime
+
+from homeassistant.components.calendar import CalendarEvent
+from homeassistant.util import dt as dt_util
+
+from .models import Activo2Event, TaskEvent
+
+
+class EventIndex:
+    """Eventos ordenados por inicio con el fin máximo acumulado.
+
+    Se construye una vez por refresco del coordinador: las fechas se pasan
+    a UTC y los CalendarEvent se crean una sola vez. Las consultas
+    usan búsqueda binaria sobre los inicios y sobre el máximo acumulado de
+    los finales, que es monótono, para acotar los candidatos.
+    """
+
+    def __init__(self, events: list[Activo2Event]) -> None:
+        # Lista de origen, para saber si el índice sigue vigente
+        self.source = events
+        items = []
+        for event in events:
+            start = dt_util.as_utc(event.start)
+            end = dt_util.as_utc(event.end)
+            items.append((start, end, CalendarEvent(
+                start=start,
+                end=end,
+                summary=event.summary,
+                description=event.description or "",
+                location=event.location or "",
+                uid=event.uid,
+            ), event))
+        items.sort(key=lambda item: item[0])
+        self._build(items)
+
+    def _build(self, items: list[tuple]) -> None:
+        """Rellena las listas a partir de (inicio, fin, CalendarEvent, evento) ordenados."""
+        self._starts = [item[0] for item in items]
+        self._ends = [item[1] for item in items]
+        self._events = [item[2] for item in items]
+        self._sources = [item[3] for item in items]
+        self._max_ends = []
+        max_end = None
+        for end in self._ends:
+            if max_end is None or end > max_end:
+                max_end = end
+            self._max_ends.append(max_end)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def group_by(self, key: Callable[[Activo2Event], str]) -> dict[str, EventIndex]:
+        """Subíndices por valor de key que comparten los CalendarEvent de este índice."""
+        groups: dict[str, list[tuple]] = {}
+        for item in zip(self._starts, self._ends, self._events, self._sources):
+            groups.setdefault(key(item[3]), []).append(item)
+        result = {}
+        for value, items in groups.items():
+            index = result[value] = EventIndex.__new__(EventIndex)
+            index.source = self.source
+            index._build(items)
+        return result
+
+    def _bounds(self, start: datetime, end: datetime) -> tuple[int, int]:
+        """Rango de posiciones que pueden solapar con [start, end]."""
+        # Los eventos que empiezan después de end no solapan
+        hi = bisect_right(self._starts, end)
+        # Antes de lo, ningún evento termina después de start
+        lo = bisect_left(self._max_ends, start, 0, hi)
+        return lo, hi
+
+    def between(self, start: datetime, end: datetime) -> list[CalendarEvent]:
+        """Eventos que solapan con el rango [start, end]."""
+        start = dt_util.as_utc(start)
+        end = dt_util.as_utc(end)
+        lo, hi = self._bounds(start, end)
+        ends = self._ends
+        return [self._events[i] for i in range(lo, hi) if ends[i] >= start]
+
+    def at(self, moment: datetime) -> CalendarEvent | None:
+        """Primer evento en curso en el instante indicado."""
+        moment = dt_util.as_utc(moment)
+        lo, hi = self._bounds(moment, moment)
+        for i in range(lo, hi):
+            if self._ends[i] >= moment:
+                return self._events[i]
+        return None
+
+    def lookup(self, moment: datetime) -> tuple[CalendarEvent | None, datetime | None]:
+        """Evento actual (o el siguiente si no hay ninguno en curso) y la
+        próxima frontera, inicio o fin de evento, en la que cambia el resultado.
+        """
+        moment = dt_util.as_utc(moment)
+        lo, hi = self._bounds(moment, moment)
+        current = None
+        boundary = self._starts[hi] if hi < len(self._starts) else None
+        for i in range(lo, hi):
+            end = self._ends[i]
+            if end < moment:
+                continue
+            if current is None:
+                current = self._events[i]
+            if end > moment and (boundary is None or end < boundary):
+                boundary = end
+        if current is None and hi < len(self._events):
+            current = self._events[hi]
+        return current, boundary
+
+
+class TaskIndex:
+    """Tareas agrupadas por proceso y por prioridad.
+
+    Se construye a partir del índice de tareas, una vez por cada calendario
+    nuevo, así que las consultas de un proceso o una prioridad solo recorren
+    sus propias tareas.
+    """
+
+    def __init__(self, index: EventIndex) -> None:
+        self.base = index
+        tasks: list[TaskEvent] = index.source
+        self.by_process = index.group_by(lambda task: task.process)
+        self.by_priority = index.group_by(lambda task: task.priority)
+        # Nombre de cada proceso, para las opciones y las entidades
+        self.processes: dict[str, str] = {}
+        for task in tasks:
+            self.processes.setdefault(task.process, task.summary)
+        self._empty = EventIndex([])
+
+    def process(self, process: str) -> EventIndex:
+        return self.by_process.get(process, self._empty)
+
+    def priority(self, priority: str) -> EventIndex:
+        return self.by_priority.get(priority, self._empty)
\ No newline at end of file
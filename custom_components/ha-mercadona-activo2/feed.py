@@ -0,0 +1,190 @@
+"""Feed iCalendar (.ics) autenticado con los turnos y tareas de cada cuenta."""
+from __future__ import annotations
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from http import HTTPStatus
+import hashlib
+import weakref
+
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, SENSOR_PREFIX
+from .coordinator import Activo2Coordinator
+from .models import Activo2Event
+
+# Se incrementa si cambia el formato del feed, para invalidar los ETag
+FEED_VERSION = 1
+# Eventos por fragmento del stream
+CHUNK_EVENTS = 200
+
+# Calendarios del feed y claves de coordinator.data que incluyen
+FEED_CALENDARS = {
+    "workshifts": ("Work Shifts", ("workshifts",)),
+    "tasks": ("Tasks", ("tasks",)),
+    "all": ("Activo2", ("workshifts", "tasks")),
+}
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Parte las líneas de más de 75 octetos (RFC 5545, 3.1)."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    current = ""
+    size = 0
+    limit = 75
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > limit:
+            parts.append(current)
+            current = ""
+            size = 0
+            # Las líneas de continuación empiezan con un espacio
+            limit = 74
+        current += char
+        size += char_size
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _format_utc(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _vevent(event: Activo2Event, dtstamp: str) -> str:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event.uid}@{SENSOR_PREFIX}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{_format_utc(event.start)}",
+        f"DTEND:{_format_utc(event.end)}",
+        f"SUMMARY:{_escape(event.summary)}",
+    ]
+    if event.location:
+        lines.append(f"LOCATION:{_escape(event.location)}")
+    if event.description:
+        lines.append(f"DESCRIPTION:{_escape(event.description)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def iter_ics(name: str, event_lists: tuple[list[Activo2Event], ...], dtstamp: datetime) -> Iterator[str]:
+    """Genera el calendario por fragmentos de CHUNK_EVENTS eventos."""
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:-//{DOMAIN}//Activo2 feed//ES",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ))
+    stamp = _format_utc(dtstamp)
+    chunk = []
+    for events in event_lists:
+        for event in events:
+            chunk.append(_vevent(event, stamp))
+            if len(chunk) >= CHUNK_EVENTS:
+                yield "".join(chunk)
+                chunk = []
+    if chunk:
+        yield "".join(chunk)
+    yield "END:VCALENDAR\r\n"
+
+
+def feed_etag(name: str, event_lists: tuple[list[Activo2Event], ...], dtstamp: datetime) -> str:
+    """ETag a partir del contenido de los eventos y del DTSTAMP, estable entre reinicios."""
+    digest = hashlib.sha1(f"{FEED_VERSION}|{name}|{_format_utc(dtstamp)}".encode())
+    for events in event_lists:
+        for event in events:
+            digest.update(
+                f"\n{event.uid}|{event.start.isoformat()}|{event.end.isoformat()}|"
+                f"{event.summary}|{event.location}|{event.description}".encode()
+            )
+    return f'"{digest.hexdigest()}"'
+
+
+class _FeedCache:
+    """Feed generado para una versión de coordinator.data."""
+
+    def __init__(self, source: tuple, name: str, dtstamp: datetime) -> None:
+        # Listas de eventos de origen: se sustituyen solo si cambian
+        self.source = source
+        self.dtstamp = dtstamp
+        self.etag = feed_etag(name, source, dtstamp)
+        # Cuerpo completo, disponible tras el primer stream
+        self.body: bytes | None = None
+
+
+class Activo2CalendarFeedView(HomeAssistantView):
+    """Sirve /api/activo2/<usuario>/<workshifts|tasks|all>.ics a usuarios autenticados."""
+
+    url = "/api/activo2/{username}/{calendar}.ics"
+    name = "api:activo2:calendar_feed"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        # coordinator -> {calendar: _FeedCache}; se libera al descargar la entrada
+        self._caches: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _coordinator(self, username: str) -> Activo2Coordinator | None:
+        for coordinator in self.hass.data.get(DOMAIN, {}).values():
+            if coordinator.username == username:
+                return coordinator
+        return None
+
+    async def get(self, request: web.Request, username: str, calendar: str) -> web.StreamResponse:
+        coordinator = self._coordinator(username)
+        if calendar not in FEED_CALENDARS or coordinator is None:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+        if not coordinator.data:
+            return web.Response(status=HTTPStatus.SERVICE_UNAVAILABLE)
+
+        title, keys = FEED_CALENDARS[calendar]
+        name = f"{SENSOR_PREFIX} {username} {title}"
+        source = tuple(coordinator.data[key] for key in keys)
+        caches = self._caches.setdefault(coordinator, {})
+        cache = caches.get(calendar)
+        if cache is None or any(a is not b for a, b in zip(cache.source, source)):
+            # DTSTAMP: último cambio del calendario, guardado con los datos en disco
+            dtstamp = coordinator.schedule_changed or datetime.now(timezone.utc)
+            cache = caches[calendar] = _FeedCache(source, name, dtstamp)
+
+        headers = {
+            "ETag": cache.etag,
+            # El cliente debe revalidar siempre; con el mismo ETag recibe un 304
+            "Cache-Control": "private, no-cache",
+        }
+        if request.if_none_match and any(
+            etag.value == cache.etag.strip('"') or etag.value == "*" for etag in request.if_none_match
+        ):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+        if cache.body is not None:
+            return web.Response(body=cache.body, content_type="text/calendar", charset="utf-8", headers=headers)
+
+        # Primera petición de esta versión: se genera y envía por fragmentos
+        response = web.StreamResponse(headers=headers)
+        response.content_type = "text/calendar"
+        response.charset = "utf-8"
+        await response.prepare(request)
+        chunks = []
+        for chunk in iter_ics(name, source, cache.dtstamp):
+            data = chunk.encode()
+            chunks.append(data)
+            await response.write(data)
+        await response.write_eof()
+        cache.body = b"".join(chunks)
+        return response
@@ -0,0 +1,186 @@
+"""Horas trabajadas por semana, mes y año calculadas una vez por refresco."""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+import logging
+
+from .lib.scheduleDTO import LeanScheduleResponse, LeanWeek
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=256)
+def parse_hours(value: str | None) -> float | None:
+    """Convierte "40:00", "7:30", "8", "7,5" o "7.5h" en horas; None si no se entiende."""
+    if not value:
+        return None
+    text = value.strip().lower().rstrip("h").strip().replace(",", ".")
+    try:
+        if ":" in text:
+            hours, minutes = text.split(":")[:2]
+            return int(hours) + int(minutes) / 60
+        return float(text)
+    except ValueError:
+        _LOGGER.debug("Cannot parse Activo2 hours %r", value)
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class HoursTotals:
+    """Totales de la semana y el mes actuales (planificados) y del año hasta hoy."""
+    week_start: date
+    week_hours: float
+    week_shifts: int
+    week_night_shifts: int
+    month_start: date
+    month_hours: float
+    month_shifts: int
+    month_night_shifts: int
+    year_start: date
+    year_hours: float
+    year_shifts: int
+    year_night_shifts: int
+
+
+def _week_signature(week: LeanWeek) -> tuple:
+    """Lo que influye en los totales de una semana, para detectar cambios."""
+    return (week.totalHours, tuple(
+        (day.date, tuple((detail.schedule.total, detail.schedule.nightShift) for detail in day.detail)
+         if day.hasTasks else ())
+        for day in week.days
+    ))
+
+
+class HoursAggregator:
+    """Totales incrementales de horas, turnos y turnos de noche.
+
+    Guarda por día (horas, turnos, noches) y las horas de cada semana que da
+    la API (Week.totalHours), y mantiene sumas por mes. En cada calendario
+    nuevo solo se recalculan las semanas cuya firma ha cambiado; los días
+    que ya no devuelve la API se conservan para el acumulado del año.
+    """
+
+    def __init__(self) -> None:
+        # "YYYY-MM-DD" -> (horas, turnos, noches); solo días con turno
+        self._days: dict[str, tuple[float, int, int]] = {}
+        # Lunes "YYYY-MM-DD" -> horas de la semana según la API
+        self._week_hours: dict[str, float] = {}
+        # "YYYY-MM" -> [horas, turnos, noches]
+        self._months: dict[str, list] = {}
+        # Lunes -> firma de la última versión procesada de la semana
+        self._signatures: dict[str, tuple] = {}
+
+    def _set_day(self, day: str, value: tuple[float, int, int] | None) -> None:
+        old = self._days.get(day)
+        if old == value:
+            return
+        month = self._months.setdefault(day[:7], [0.0, 0, 0])
+        if old is not None:
+            for i in range(3):
+                month[i] -= old[i]
+        if value is None:
+            del self._days[day]
+        else:
+            self._days[day] = value
+            for i in range(3):
+                month[i] += value[i]
+
+    def update(self, schedule_data: LeanScheduleResponse) -> bool:
+        """Incorpora un calendario nuevo; devuelve True si cambió alguna semana."""
+        changed = False
+        for month in schedule_data.months or ():
+            for week in month.weeks:
+                if not week.days:
+                    continue
+                first = date.fromisoformat(week.days[0].date)
+                monday = (first - timedelta(days=first.weekday())).isoformat()
+                signature = _week_signature(week)
+                # Una semana entre dos meses aparece en ambos con la misma firma
+                if self._signatures.get(monday) == signature:
+                    continue
+                self._signatures[monday] = signature
+                changed = True
+
+                week_hours = parse_hours(week.totalHours)
+                if week_hours is None:
+                    self._week_hours.pop(monday, None)
+                else:
+                    self._week_hours[monday] = week_hours
+                for day in week.days:
+                    if not (day.hasTasks and day.detail):
+                        self._set_day(day.date, None)
+                        continue
+                    hours = sum(parse_hours(detail.schedule.total) or 0.0 for detail in day.detail)
+                    nights = sum(1 for detail in day.detail if detail.schedule.nightShift)
+                    self._set_day(day.date, (hours, len(day.detail), nights))
+        return changed
+
+    def prune(self, today: date) -> None:
+        """Olvida lo anterior al 1 de enero del año pasado."""
+        limit = date(today.year - 1, 1, 1).isoformat()
+        for day in [day for day in self._days if day < limit]:
+            self._set_day(day, None)
+        for key in [key for key in self._months if key < limit[:7]]:
+            del self._months[key]
+        for monday in [monday for monday in self._week_hours if monday < limit]:
+            del self._week_hours[monday]
+        for monday in [monday for monday in self._signatures if monday < limit]:
+            del self._signatures[monday]
+
+    def _sum_days(self, start: date, end: date) -> tuple[float, int, int]:
+        hours, shifts, nights = 0.0, 0, 0
+        day = start
+        while day <= end:
+            value = self._days.get(day.isoformat())
+            if value is not None:
+                hours += value[0]
+                shifts += value[1]
+                nights += value[2]
+            day += timedelta(days=1)
+        return hours, shifts, nights
+
+    def totals(self, today: date) -> HoursTotals:
+        week_start = today - timedelta(days=today.weekday())
+        week_hours, week_shifts, week_nights = self._sum_days(week_start, week_start + timedelta(days=6))
+        # Las horas semanales de la API mandan sobre la suma de los días
+        week_hours = self._week_hours.get(week_start.isoformat(), week_hours)
+
+        month_start = today.replace(day=1)
+        month_hours, month_shifts, month_nights = self._months.get(month_start.isoformat()[:7], (0.0, 0, 0))
+
+        # Año hasta hoy: meses anteriores completos y el actual hasta hoy
+        year_hours, year_shifts, year_nights = self._sum_days(month_start, today)
+        for month in range(1, today.month):
+            values = self._months.get(f"{today.year}-{month:02d}")
+            if values is not None:
+                year_hours += values[0]
+                year_shifts += values[1]
+                year_nights += values[2]
+
+        return HoursTotals(
+            week_start=week_start,
+            week_hours=round(week_hours, 2),
+            week_shifts=week_shifts,
+            week_night_shifts=week_nights,
+            month_start=month_start,
+            month_hours=round(month_hours, 2),
+            month_shifts=month_shifts,
+            month_night_shifts=month_nights,
+            year_start=today.replace(month=1, day=1),
+            year_hours=round(year_hours, 2),
+            year_shifts=year_shifts,
+            year_night_shifts=year_nights,
+        )
+
+    def as_dict(self) -> dict:
+        return {"days": self._days, "weeks": self._week_hours}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> HoursAggregator:
+        """Reconstruye el agregador guardado con as_dict()."""
+        aggregator = cls()
+        for day, value in data.get("days", {}).items():
+            aggregator._set_day(day, tuple(value))
+        aggregator._week_hours = dict(data.get("weeks", {}))
+        return aggregator
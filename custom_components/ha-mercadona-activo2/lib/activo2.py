@@ -1,19 +1,282 @@
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager, nullcontext
+from urllib.parse import urlsplit
+import asyncio
+import base64
+import hashlib
+import json
 import logging
+import random
+import time
+import aiohttp
 from .const import *
-from .scheduleDTO import ScheduleResponse
+from .scheduleDTO import LeanScheduleResponse, parse_schedule
 from .userinfoDTO import UserDTO
 
 _LOGGER = logging.getLogger(__name__)
 
+
+class Activo2Error(Exception):
+    """Error base de la API de Activo2."""
+
+
+class Activo2AuthError(Activo2Error):
+    """Credenciales incorrectas o token rechazado (401)."""
+
+
+class Activo2ConnectionError(Activo2Error):
+    """Error de red, timeout o error transitorio del servidor (429/5xx)."""
+
+
+class Activo2CircuitOpenError(Activo2ConnectionError):
+    """El host ha fallado demasiadas veces seguidas y no se le llama por ahora."""
+
+
+class Activo2ResponseError(Activo2Error):
+    """Respuesta inesperada o que no cumple el DTO."""
+
+
+def get_token_expiry(id_token):
+    """Devuelve el "exp" (epoch) del id_token JWT o None si no se puede leer."""
+    try:
+        payload = id_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class SingleFlight(object):
+    """Agrupa las llamadas concurrentes con la misma clave en una sola.
+
+    Mientras una llamada está en curso, el resto de llamantes con la misma
+    clave esperan su resultado en lugar de repetir la petición HTTP.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+
+            def _done(finished, key=key):
+                if self._inflight.get(key) is finished:
+                    del self._inflight[key]
+
+            task.add_done_callback(_done)
+        # shield: si un llamante se cancela, los demás siguen esperando
+        return await asyncio.shield(task)
+
+
+class Activo2TokenManager(object):
+    """Cachea el id_token por usuario y lo renueva poco antes de que caduque."""
+
+    def __init__(self, api, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self._api = api
+        self._refresh_margin = refresh_margin
+        # username -> (id_token, expires_at)
+        self._tokens = {}
+        self._flights = SingleFlight()
+
+    def invalidate(self, username, id_token=None):
+        """Olvida el token del usuario (solo si sigue siendo id_token, si se indica)."""
+        cached = self._tokens.get(username)
+        if cached is not None and (id_token is None or cached[0] == id_token):
+            del self._tokens[username]
+
+    def cached_token(self, username):
+        """id_token en caché si aún no toca renovarlo; None si hace falta login."""
+        cached = self._tokens.get(username)
+        if cached is not None and time.time() < cached[1] - self._refresh_margin:
+            return cached[0]
+        return None
+
+    async def get_token(self, username, password):
+        cached = self.cached_token(username)
+        if cached is not None:
+            return cached
+        return await self._flights.run(
+            ("login", username, password), lambda: self._login(username, password)
+        )
+
+    async def _login(self, username, password):
+        id_token = await self._api.login(username, password)
+        if id_token is None:
+            self.invalidate(username)
+            raise Activo2AuthError(f"Failed to authenticate with Activo2 with username = {username}")
+
+        expires_at = get_token_expiry(id_token)
+        if expires_at is None:
+            expires_at = time.time() + TOKEN_DEFAULT_LIFETIME
+        self._tokens[username] = (id_token, expires_at)
+        _LOGGER.debug("New id_token for %s valid until %s", username, expires_at)
+        return id_token
+
+    async def call(self, username, password, method):
+        """Llama a method(id_token) y, si responde 401, vuelve a autenticar una sola vez."""
+        id_token = await self.get_token(username, password)
+        try:
+            return await method(id_token)
+        except Activo2AuthError:
+            _LOGGER.debug("id_token rejected for %s, logging in again", username)
+            self.invalidate(username, id_token)
+            id_token = await self.get_token(username, password)
+            return await method(id_token)
+
+
+class HostLimiter(object):
+    """Limita las peticiones simultáneas a cada host, compartido entre cuentas."""
+
+    def __init__(self, limit=MAX_REQUESTS_PER_HOST):
+        self._limit = limit
+        self._semaphores = {}
+
+    @asynccontextmanager
+    async def slot(self, url):
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self._limit)
+        async with semaphore:
+            yield
+
+
+class CircuitBreaker(object):
+    """Circuit breaker por host, compartido entre cuentas.
+
+    Tras BREAKER_FAILURE_THRESHOLD fallos seguidos el host queda abierto
+    durante BREAKER_RESET_TIMEOUT segundos; después se deja pasar una
+    petición de prueba que lo cierra si va bien o lo vuelve a abrir si falla.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        # host -> [fallos seguidos, abierto hasta (monotonic)]
+        self._hosts = {}
+
+    def before_request(self, url):
+        host = urlsplit(url).netloc
+        state = self._hosts.get(host)
+        if state is None or state[0] < self._threshold:
+            return
+        now = time.monotonic()
+        if now < state[1]:
+            raise Activo2CircuitOpenError(f"Circuit open for {host}")
+        # Semiabierto: una sola petición de prueba hasta conocer su resultado
+        state[1] = now + self._reset_timeout
+
+    def record_success(self, url):
+        self._hosts.pop(urlsplit(url).netloc, None)
+
+    def record_failure(self, url):
+        host = urlsplit(url).netloc
+        state = self._hosts.setdefault(host, [0, 0.0])
+        state[0] += 1
+        if state[0] >= self._threshold:
+            state[1] = time.monotonic() + self._reset_timeout
+            if state[0] == self._threshold:
+                _LOGGER.warning("Too many errors calling %s, pausing requests for %ss", host, self._reset_timeout)
+
+
+def _retry_after(response):
+    """Segundos de la cabecera Retry-After (número o fecha HTTP), como mucho
+    RETRY_MAX_DELAY; None si no viene o no se entiende."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = int(value)
+    else:
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        seconds = (moment - datetime.now(timezone.utc)).total_seconds()
+    return min(RETRY_MAX_DELAY, max(0, seconds))
+
+
 class Activo2API(object):
-    def __init__(self, session):
+    def __init__(
+        self,
+        session,
+        limiter=None,
+        tokens=None,
+        flights=None,
+        breaker=None,
+        sts_base_url=STS_BASE_URL,
+        api_base_url=API_BASE_URL,
+    ):
         self._session = session
+        # URLs configurables para poder usar un servidor de pruebas
+        self._token_url = sts_base_url + OAUTH2_TOKEN_PATH
+        self._userinfo_url = api_base_url + API_USERINFO_PATH
+        self._schedule_url = api_base_url + API_SCHEDULE_PATH
+        self._limiter = limiter
+        self._breaker = breaker if breaker is not None else CircuitBreaker()
+        # Se pueden compartir entre instancias para agrupar peticiones de varias cuentas
+        self.tokens = tokens if tokens is not None else Activo2TokenManager(self)
+        self._flights = flights if flights is not None else SingleFlight()
+        # Tiempos (segundos) y tamaño de la última descarga del calendario
+        self.stats = {}
+        # Contexto alrededor de la validación del calendario (perfilado)
+        self.validation_context = nullcontext
+
+    async def _send(self, method, url, **kwargs):
+        """Hace la petición dentro del límite por host y lee el cuerpo completo,
+        de modo que la conexión vuelve al pool antes de liberar el hueco."""
+        if self._limiter is None:
+            response = await self._session.request(method, url, **kwargs)
+            await response.read()
+            return response
+        async with self._limiter.slot(url):
+            response = await self._session.request(method, url, **kwargs)
+            await response.read()
+            return response
+
+    async def _request(self, method, url, **kwargs):
+        """Petición con reintentos ante errores transitorios (backoff exponencial
+        con jitter, o el Retry-After del servidor en 429/503) y respetando el
+        circuit breaker del host."""
+        error = None
+        retry_after = None
+        for attempt in range(RETRY_ATTEMPTS):
+            if attempt:
+                if retry_after is not None:
+                    # El servidor indica cuánto esperar (429/503)
+                    await asyncio.sleep(retry_after)
+                else:
+                    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                    await asyncio.sleep(random.uniform(0, delay))
+                retry_after = None
+            self._breaker.before_request(url)
+            try:
+                response = await self._send(method, url, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT), **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                error = Activo2ConnectionError(f"Error calling {url}: {err!r}")
+            else:
+                if response.status not in RETRY_STATUSES:
+                    self._breaker.record_success(url)
+                    return response
+                error = Activo2ConnectionError(f"Error calling {url}: HTTP {response.status}")
+                if response.status in (429, 503):
+                    retry_after = _retry_after(response)
+            self._breaker.record_failure(url)
+            _LOGGER.debug("Attempt %d/%d failed: %s", attempt + 1, RETRY_ATTEMPTS, error)
+        raise error
 
     # return id_token to call API
     async def login(self, username, password):
         # Realiza la solicitud para obtener el id_token
-        response_token = await self._session.post(OAUTH2_TOKEN_URL, data={
+        response_token = await self._request("POST", self._token_url, data={
             "grant_type": OAUTH2_GRANT_TYPE,
             "username": USERNAME_PREFIX + username,
             "password": password,
@@ -22,10 +285,12 @@ class Activo2API(object):
             "response_type": OAUTH2_RESPONSE_TYPE
         }, headers=self._generateHeaders(None))
         # _LOGGER.debug(response_token)
-        if response_token.status != 200:
+        if response_token.status in (400, 401):
             _LOGGER.error("Error login. Status: " + str(
                 response_token.status) + ". Response body: " + await response_token.text())
             return None
+        if response_token.status != 200:
+            raise Activo2ResponseError(f"Unexpected login status {response_token.status}: {await response_token.text()}")
 
         # Extrae el id_token de la respuesta
         json = await response_token.json()
@@ -49,28 +314,79 @@ class Activo2API(object):
         return headers
 
     async def getUserInfo(self, id_token) -> UserDTO:
-        response_api = await self._session.post(API_URL_USERINFO, headers=self._generateHeaders(id_token))
+        return await self._flights.run(
+            ("userinfo", id_token), lambda: self._getUserInfo(id_token)
+        )
+
+    async def _getUserInfo(self, id_token) -> UserDTO:
+        response_api = await self._request("POST", self._userinfo_url, headers=self._generateHeaders(id_token))
         _LOGGER.info(response_api)
         if response_api.status == 200:
-            api_json = await response_api.json()
-            _LOGGER.debug(api_json)
-            return UserDTO(**api_json)
-        else:
-            _LOGGER.error(f"Error calling API: {response_api.status}. Body: {await response_api.text()}")
-        return UserDTO()
+            try:
+                api_json = await response_api.json()
+                _LOGGER.debug(api_json)
+                return UserDTO(**api_json)
+            except (aiohttp.ContentTypeError, ValueError, TypeError) as err:
+                raise Activo2ResponseError(f"Invalid user info response: {err}") from err
+        elif response_api.status == 401:
+            raise Activo2AuthError("Unauthorized calling user info")
+        raise Activo2ResponseError(f"Error calling API: {response_api.status}. Body: {await response_api.text()}")
 
     # -----------------------
 
-    async def getFullDaysData(self, id_token) -> ScheduleResponse:
-        response_api = await self._session.get(API_URL_SCHEDULE, headers=self._generateHeaders(id_token))
+    async def getFullDaysData(self, id_token) -> LeanScheduleResponse:
+        schedule, _ = await self.getFullDaysDataIfChanged(id_token)
+        return schedule
+
+    async def getFullDaysDataIfChanged(self, id_token, fingerprint=None):
+        """Descarga el calendario salvo que no haya cambiado desde fingerprint.
+
+        Devuelve (LeanScheduleResponse, fingerprint) o (None, fingerprint) si el
+        calendario es el mismo. El fingerprint es el ETag o Last-Modified del
+        backend si los envía y, si no, un hash del cuerpo de la respuesta.
+        """
+        return await self._flights.run(
+            ("schedule", id_token, fingerprint),
+            lambda: self._getFullDaysDataIfChanged(id_token, fingerprint),
+        )
+
+    async def _getFullDaysDataIfChanged(self, id_token, fingerprint):
+        headers = self._generateHeaders(id_token)
+        if fingerprint and fingerprint.startswith("etag:"):
+            headers["If-None-Match"] = fingerprint[5:]
+        elif fingerprint and fingerprint.startswith("last-modified:"):
+            headers["If-Modified-Since"] = fingerprint[14:]
+
+        start = time.perf_counter()
+        response_api = await self._request("GET", self._schedule_url, headers=headers)
+        self.stats["schedule_download"] = time.perf_counter() - start
         _LOGGER.info(response_api)
 
+        if response_api.status == 304:
+            return None, fingerprint
         if response_api.status == 200:
-            api_json = await response_api.json()
-            _LOGGER.debug(api_json)
-            # Convertimos el JSON recibido a una instancia del DTO ScheduleResponse
-            return ScheduleResponse(**api_json)
-        else:
-            _LOGGER.error(f"Error calling API: {response_api.status}. Body: {await response_api.text()}")
-
-        return ScheduleResponse()
\ No newline at end of file
+            body = await response_api.read()
+            self.stats["schedule_bytes"] = len(body)
+            if "ETag" in response_api.headers:
+                new_fingerprint = "etag:" + response_api.headers["ETag"]
+            elif "Last-Modified" in response_api.headers:
+                new_fingerprint = "last-modified:" + response_api.headers["Last-Modified"]
+            else:
+                new_fingerprint = "sha1:" + hashlib.sha1(body).hexdigest()
+            if new_fingerprint == fingerprint:
+                # Mismo contenido: no hace falta volver a validar el JSON
+                return None, fingerprint
+
+            _LOGGER.debug("Schedule response: %d bytes", len(body))
+            try:
+                # Validamos los bytes directamente con el DTO reducido
+                start = time.perf_counter()
+                with self.validation_context():
+                    schedule = parse_schedule(body)
+                self.stats["schedule_parse"] = time.perf_counter() - start
+                return schedule, new_fingerprint
+            except (ValueError, TypeError) as err:
+                raise Activo2ResponseError(f"Invalid schedule response: {err}") from err
+        elif response_api.status == 401:
+            raise Activo2AuthError("Unauthorized calling schedule")
+        raise Activo2ResponseError(f"Error calling API: {response_api.status}. Body: {await response_api.text()}")
@@ -1,7 +1,9 @@
 # Define los parámetros necesarios
 # PRE: https://sts.premercadona.es/adfs/oauth2/token/
 # PRO: https://sts.mercadona.es/adfs/oauth2/token/
-OAUTH2_TOKEN_URL = "https://sts.mercadona.es/adfs/oauth2/token/"
+STS_BASE_URL = "https://sts.mercadona.es"
+OAUTH2_TOKEN_PATH = "/adfs/oauth2/token/"
+OAUTH2_TOKEN_URL = STS_BASE_URL + OAUTH2_TOKEN_PATH
 # PRE: 8e6dc338-dcf3-44f6-a443-8f32897641aa
 # PRO: 06b18d7d-23da-4e41-8654-8ec8704e297e
 OAUTH2_CLIENT_ID = "06b18d7d-23da-4e41-8654-8ec8704e297e"
@@ -9,13 +11,32 @@ OAUTH2_SCOPE = "openid"
 OAUTH2_RESPONSE_TYPE = "id_token code"
 OAUTH2_GRANT_TYPE = "password"
 
-# PRE: https://back.activo2.pre.mercadona.com/mot/v2/schedule?lang=es
-# PRO: https://back.activo2.mercadona.com/mot/v2/schedule?lang=es
-API_URL_SCHEDULE = "https://back.activo2.mercadona.com/mot/v2/schedule?lang=es"
-# PRE: https://back.activo2.pre.mercadona.com/user/info
-# PRO: https://back.activo2.mercadona.com/user/info
-API_URL_USERINFO = "https://back.activo2.mercadona.com/user/info"
+# PRE: https://back.activo2.pre.mercadona.com
+# PRO: https://back.activo2.mercadona.com
+API_BASE_URL = "https://back.activo2.mercadona.com"
+API_SCHEDULE_PATH = "/mot/v2/schedule?lang=es"
+API_USERINFO_PATH = "/user/info"
+API_URL_SCHEDULE = API_BASE_URL + API_SCHEDULE_PATH
+API_URL_USERINFO = API_BASE_URL + API_USERINFO_PATH
 
 # PRE: preproduccion.net\\
 # PRO: ofidona.net\\
 USERNAME_PREFIX = "ofidona.net\\"
+
+# Margen (segundos) con el que se renueva el id_token antes de que caduque
+TOKEN_REFRESH_MARGIN = 300
+# Vida útil (segundos) asumida si no se puede leer el "exp" del id_token
+TOKEN_DEFAULT_LIFETIME = 600
+
+# Peticiones simultáneas máximas a cada host entre todas las cuentas
+MAX_REQUESTS_PER_HOST = 4
+
+# Reintentos ante errores transitorios (segundos)
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 30
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+REQUEST_TIMEOUT = 30
+# Circuit breaker por host
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 300
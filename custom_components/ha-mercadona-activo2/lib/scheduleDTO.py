@@ -1,6 +1,11 @@
 from pydantic import BaseModel
 from typing import List, Optional
 
+try:
+    from pydantic import TypeAdapter
+except ImportError:  # pydantic v1
+    TypeAdapter = None
+
 class DayType(BaseModel):
     ids: List[str]
     name: str
@@ -58,3 +63,54 @@ class Month(BaseModel):
 class ScheduleResponse(BaseModel):
     startMonday: bool
     months: List[Month]
+
+
+# Modelos reducidos con solo los campos que usa la integración. El resto del
+# JSON se ignora sin validarlo, lo que abarata los calendarios de varios meses.
+
+class LeanTask(BaseModel):
+    processId: str
+    colour: Optional[str]
+    name: str
+    description: str
+    abbreviation: Optional[str] = None
+    priority: str
+    startHour: str
+    endHour: str
+
+class LeanSchedule(BaseModel):
+    start: str
+    end: str
+    total: str
+    nightShift: bool
+    nightShiftLabel: str
+
+class LeanDetail(BaseModel):
+    store: Store
+    schedule: LeanSchedule
+    taskList: List[LeanTask]
+
+class LeanDay(BaseModel):
+    date: str
+    hasTasks: bool
+    detail: List[LeanDetail]
+
+class LeanWeek(BaseModel):
+    totalHours: Optional[str] = None
+    days: List[LeanDay]
+
+class LeanMonth(BaseModel):
+    weeks: List[LeanWeek]
+
+class LeanScheduleResponse(BaseModel):
+    months: List[LeanMonth]
+
+
+SCHEDULE_ADAPTER = TypeAdapter(LeanScheduleResponse) if TypeAdapter is not None else None
+
+
+def parse_schedule(body: bytes) -> LeanScheduleResponse:
+    """Valida el JSON del calendario directamente desde los bytes, en una pasada."""
+    if SCHEDULE_ADAPTER is not None:
+        return SCHEDULE_ADAPTER.validate_json(body)
+    return LeanScheduleResponse.parse_raw(body)
@@ -0,0 +1,89 @@
+"""Métricas de rendimiento de los refrescos de una cuenta de Activo2."""
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+import math
+import time
+
+# Refrescos que se conservan para los histogramas de diagnóstico
+HISTORY_SIZE = 100
+# Límites superiores (segundos) de los cubos de los histogramas
+HISTOGRAM_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RefreshMetrics:
+    """Duración de cada fase del refresco, tamaños y número de eventos.
+
+    Guarda el último valor de cada métrica y un histórico circular de las
+    duraciones para calcular histogramas y percentiles en los diagnósticos.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE) -> None:
+        # Última duración (segundos) de cada fase
+        self.timings: dict[str, float] = {}
+        # Tamaños (bytes) y recuentos de la última respuesta
+        self.sizes: dict[str, int] = {}
+        self.counts: dict[str, int] = {}
+        self._history_size = history_size
+        self._history: dict[str, deque[float]] = {}
+
+    def start_refresh(self) -> None:
+        """Olvida las duraciones y tamaños del refresco anterior: las fases que
+        no se ejecuten en este (p. ej. login con token en caché) quedan en None."""
+        self.timings.clear()
+        self.sizes.clear()
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.timings[phase] = round(seconds, 3)
+        history = self._history.get(phase)
+        if history is None:
+            history = self._history[phase] = deque(maxlen=self._history_size)
+        history.append(seconds)
+
+    @contextmanager
+    def measure(self, phase: str):
+        """Mide la duración del bloque, también si termina con una excepción."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def histogram(self, phase: str) -> dict | None:
+        """Resumen de las últimas duraciones de una fase."""
+        history = self._history.get(phase)
+        if not history:
+            return None
+        ordered = sorted(history)
+        buckets = {}
+        remaining = iter(ordered)
+        value = next(remaining, None)
+        for limit in HISTOGRAM_BUCKETS:
+            count = 0
+            while value is not None and value <= limit:
+                count += 1
+                value = next(remaining, None)
+            buckets["+Inf" if math.isinf(limit) else f"le_{limit}"] = count
+        return {
+            "count": len(ordered),
+            "min": round(ordered[0], 4),
+            "mean": round(sum(ordered) / len(ordered), 4),
+            "p50": round(_percentile(ordered, 50), 4),
+            "p90": round(_percentile(ordered, 90), 4),
+            "p99": round(_percentile(ordered, 99), 4),
+            "max": round(ordered[-1], 4),
+            "buckets": buckets,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "timings": self.timings,
+            "sizes": self.sizes,
+            "counts": self.counts,
+            "histograms": {phase: self.histogram(phase) for phase in self._history},
+        }
@@ -0,0 +1,127 @@
+"""Modelos compactos con los datos que el coordinador guarda por cuenta."""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+import sys
+
+from .lib.userinfoDTO import UserDTO
+
+
+def intern(value: str | None) -> str | None:
+    """Comparte una única copia de los textos que se repiten entre eventos."""
+    return sys.intern(value) if value is not None else None
+
+
+@dataclass(frozen=True, slots=True)
+class Activo2Event:
+    """Evento de calendario de Activo2."""
+    uid: str
+    summary: str
+    start: datetime
+    end: datetime
+    location: str
+    description: str
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Reconstruye un evento guardado con dataclasses.asdict()."""
+        values = {key: intern(value) if isinstance(value, str) else value for key, value in data.items()}
+        values["start"] = datetime.fromisoformat(data["start"])
+        values["end"] = datetime.fromisoformat(data["end"])
+        return cls(**values)
+
+
+@dataclass(frozen=True, slots=True)
+class Workshift(Activo2Event):
+    """Turno de trabajo completo de un día."""
+    night_shift: bool
+    night_shift_label: str
+
+
+@dataclass(frozen=True, slots=True)
+class TaskEvent(Activo2Event):
+    """Tarea dentro de un turno."""
+    color: str | None
+    priority: str
+    process_id: str
+    abbreviation: str | None
+
+    @property
+    def process(self) -> str:
+        """Proceso de la tarea: la abreviatura si la hay, si no el processId."""
+        return self.abbreviation or self.process_id
+
+
+@dataclass(frozen=True, slots=True)
+class UserInfo:
+    """Datos del usuario que usan las entidades (subconjunto de UserDTO)."""
+    userid: str
+    name: str
+    lastname: str
+    email: str
+    photo: str
+    company: str
+    cod_company: str
+    department: str
+    region: str
+    division_zone: str
+    cod_store: str
+    store: str
+    employee_number: str | None
+
+    @classmethod
+    def from_dto(cls, user_info: UserDTO) -> UserInfo:
+        employee_number = None
+        for company in user_info.companies or ():
+            if company.active:
+                employee_number = company.employee_number
+                break
+        return cls(
+            userid=user_info.userid,
+            name=user_info.name,
+            lastname=user_info.lastname,
+            email=user_info.email,
+            photo=user_info.photo,
+            company=intern(user_info.company),
+            cod_company=intern(user_info.cod_company),
+            department=intern(user_info.department),
+            region=intern(user_info.region),
+            division_zone=intern(user_info.division_zone),
+            cod_store=intern(user_info.cod_store),
+            store=intern(user_info.store),
+            employee_number=employee_number,
+        )
+
+
+def estimate_size(data: dict | None) -> int:
+    """Tamaño aproximado en bytes de coordinator.data.
+
+    Cada objeto se cuenta una sola vez, de modo que los textos compartidos
+    (tiendas, colores, prioridades) no se suman por cada evento.
+    """
+    if not data:
+        return 0
+    seen: set[int] = set()
+    total = 0
+
+    def add(obj) -> None:
+        nonlocal total
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                add(key)
+                add(value)
+        elif isinstance(obj, (list, tuple)):
+            for item in obj:
+                add(item)
+        elif hasattr(obj, "__slots__"):
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, slot):
+                        add(getattr(obj, slot))
+
+    add(data)
+    return total
@@ -0,0 +1,231 @@
+"""Caché en disco de la foto de perfil con miniaturas."""
+from __future__ import annotations
+import asyncio
+from datetime import datetime, timedelta
+from http import HTTPStatus
+import hashlib
+import io
+import json
+import logging
+import os
+import secrets
+import shutil
+
+import aiohttp
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.components.http.auth import async_sign_path
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN
+
+try:
+    from PIL import Image
+except ImportError:  # sin Pillow las miniaturas son la foto original
+    Image = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# Lado máximo (px) de las miniaturas
+THUMBNAIL_SIZES = (64, 256)
+# Miniatura que usa el sensor como entity_picture
+PICTURE_SIZE = 64
+PHOTO_TIMEOUT = 30
+# Validez de la URL firmada del entity_picture; se renueva a mitad de plazo
+PICTURE_URL_EXPIRATION = timedelta(days=7)
+PICTURE_URL_REFRESH = PICTURE_URL_EXPIRATION / 2
+
+
+def _photo_dir(hass: HomeAssistant) -> str:
+    return hass.config.path(STORAGE_DIR, f"{DOMAIN}_photos")
+
+
+def _resize(body: bytes, size: int) -> bytes:
+    """Miniatura JPEG de como mucho size x size píxeles (en el executor)."""
+    if Image is None:
+        return body
+    with Image.open(io.BytesIO(body)) as image:
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, "JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+
+class PhotoCache:
+    """Foto de perfil de una cuenta guardada en disco.
+
+    Solo se descarga cuando cambia la URL o, con la misma URL, cuando el
+    servidor no responde 304 y el contenido tiene otro hash. Las miniaturas
+    se generan en el executor una vez por foto. El token identifica el
+    contenido y sirve de URL inmutable para los navegadores.
+    """
+
+    def __init__(self, hass: HomeAssistant, session: aiohttp.ClientSession, key: str) -> None:
+        self.hass = hass
+        self._session = session
+        self._path = os.path.join(_photo_dir(hass), slugify(key))
+        self.url: str | None = None
+        self.token: str | None = None
+        self.updated: datetime | None = None
+        self._meta: dict = {}
+        # Bytes de la foto original ("original") y de cada miniatura
+        self._images: dict[str, bytes] = {}
+        # Última URL firmada: (ruta, URL, momento de la firma)
+        self._signed: tuple[str, str, datetime] | None = None
+
+    @staticmethod
+    async def async_remove(hass: HomeAssistant, key: str) -> None:
+        """Borra la foto guardada de una cuenta."""
+        path = os.path.join(_photo_dir(hass), slugify(key))
+        await hass.async_add_executor_job(shutil.rmtree, path, True)
+
+    def image(self, size: int | None = None) -> bytes | None:
+        return self._images.get(str(size) if size else "original")
+
+    def picture_url(self, size: int = PICTURE_SIZE) -> str | None:
+        """URL firmada de la miniatura; la misma hasta la mitad de su validez,
+        para no cambiar el estado de la entidad en cada escritura."""
+        if self.token is None:
+            return None
+        path = f"/api/activo2/photo/{self.token}_{size}.jpg"
+        now = dt_util.utcnow()
+        if self._signed is None or self._signed[0] != path or now - self._signed[2] >= PICTURE_URL_REFRESH:
+            self._signed = (path, async_sign_path(self.hass, path, PICTURE_URL_EXPIRATION), now)
+        return self._signed[1]
+
+    async def async_load(self) -> None:
+        """Carga la última foto guardada, si la hay."""
+        try:
+            meta, images = await self.hass.async_add_executor_job(self._read)
+        except (OSError, ValueError, KeyError) as err:
+            _LOGGER.debug("No cached Activo2 photo in %s: %s", self._path, err)
+            return
+        self._apply(meta, images)
+
+    async def async_update(self, url: str | None) -> bool:
+        """Descarga la foto si ha cambiado; devuelve True si hay una nueva."""
+        if not url:
+            return False
+        headers = {}
+        if url == self.url and self._meta.get("etag"):
+            headers["If-None-Match"] = self._meta["etag"]
+        elif url == self.url and self._meta.get("last_modified"):
+            headers["If-Modified-Since"] = self._meta["last_modified"]
+
+        try:
+            async with self._session.get(
+                url, headers=headers, timeout=aiohttp.ClientTimeout(total=PHOTO_TIMEOUT)
+            ) as response:
+                if response.status == HTTPStatus.NOT_MODIFIED:
+                    return False
+                if response.status != HTTPStatus.OK:
+                    _LOGGER.warning("Error fetching Activo2 photo. Status: %s", response.status)
+                    return False
+                body = await response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            # Sin foto nueva se sigue usando la guardada
+            _LOGGER.warning("Error fetching Activo2 photo: %r", err)
+            return False
+
+        digest = hashlib.sha1(body).hexdigest()
+        meta = {
+            **self._meta,
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        if digest == self._meta.get("digest") and self.token is not None:
+            # Mismo contenido: solo se actualizan las cabeceras de caché
+            self._meta = meta
+            await self.hass.async_add_executor_job(self._write_meta, meta)
+            return False
+
+        salt = self._meta.get("salt") or secrets.token_hex(16)
+        meta.update({
+            "digest": digest,
+            "salt": salt,
+            # Con la sal el token no se puede deducir de la foto
+            "token": hashlib.sha256(f"{salt}{digest}".encode()).hexdigest()[:32],
+            "updated": dt_util.utcnow().isoformat(),
+        })
+        try:
+            images = await self.hass.async_add_executor_job(self._store, meta, body)
+        except OSError as err:
+            _LOGGER.warning("Cannot store Activo2 photo in %s: %s", self._path, err)
+            return False
+        self._apply(meta, images)
+        _LOGGER.debug("Updated Activo2 photo %s", self._path)
+        return True
+
+    def _apply(self, meta: dict, images: dict[str, bytes]) -> None:
+        self._meta = meta
+        self._images = images
+        self.url = meta["url"]
+        self.token = meta["token"]
+        self.updated = datetime.fromisoformat(meta["updated"])
+
+    def _read(self) -> tuple[dict, dict[str, bytes]]:
+        with open(os.path.join(self._path, "meta.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+        images = {}
+        for name in ("original", *map(str, THUMBNAIL_SIZES)):
+            with open(os.path.join(self._path, f"{name}.jpg"), "rb") as file:
+                images[name] = file.read()
+        return meta, images
+
+    def _store(self, meta: dict, body: bytes) -> dict[str, bytes]:
+        images = {"original": body}
+        for size in THUMBNAIL_SIZES:
+            try:
+                images[str(size)] = _resize(body, size)
+            except (OSError, ValueError) as err:
+                _LOGGER.warning("Cannot resize Activo2 photo: %s", err)
+                images[str(size)] = body
+        os.makedirs(self._path, exist_ok=True)
+        for name, data in images.items():
+            with open(os.path.join(self._path, f"{name}.jpg"), "wb") as file:
+                file.write(data)
+        self._write_meta(meta)
+        return images
+
+    def _write_meta(self, meta: dict) -> None:
+        try:
+            with open(os.path.join(self._path, "meta.json"), "w", encoding="utf-8") as file:
+                json.dump(meta, file)
+        except OSError as err:
+            _LOGGER.warning("Cannot store Activo2 photo in %s: %s", self._path, err)
+
+
+class Activo2PhotoView(HomeAssistantView):
+    """Sirve las miniaturas por token de contenido.
+
+    Requiere autenticación: el entity_picture es una URL firmada (authSig),
+    como las de las entidades image. Solo se sirven los tamaños de
+    THUMBNAIL_SIZES, nunca la foto original.
+    """
+
+    url = r"/api/activo2/photo/{token:[0-9a-f]+}_{size:\d+}.jpg"
+    name = "api:activo2:photo"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+
+    async def get(self, request: web.Request, token: str, size: str) -> web.Response:
+        if int(size) not in THUMBNAIL_SIZES:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+        for coordinator in self.hass.data.get(DOMAIN, {}).values():
+            photo: PhotoCache = coordinator.photo
+            if photo.token == token:
+                if (data := photo.image(int(size))) is not None:
+                    return web.Response(
+                        body=data,
+                        content_type="image/jpeg",
+                        # Contenido inmutable por token, pero solo en la caché del navegador
+                        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+                    )
+        return web.Response(status=HTTPStatus.NOT_FOUND)
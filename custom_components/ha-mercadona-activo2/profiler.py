@@ -0,0 +1,173 @@
+"""Perfilado bajo demanda del refresco y de las consultas de calendario."""
+from __future__ import annotations
+from collections import Counter
+from contextlib import contextmanager
+import cProfile
+import logging
+import os
+import sys
+import threading
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util, slugify
+
+_LOGGER = logging.getLogger(__name__)
+
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLING = "sampling"
+# Periodo de muestreo del modo sampling (segundos)
+SAMPLE_INTERVAL = 0.005
+
+
+class _StackSampler(threading.Thread):
+    """Muestrea la pila del hilo del event loop mientras hay secciones perfiladas
+    activas y cuenta las pilas en formato "collapsed" (flamegraph.pl, speedscope)."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        super().__init__(name="activo2_profiler", daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.active = 0
+        self.samples: Counter[str] = Counter()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self._thread_id)  # pylint: disable=protected-access
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Activo2Profiler:
+    """Sesión de perfilado de una cuenta durante N refrescos o N segundos.
+
+    Solo se miden las fases síncronas de la cuenta (validación,
+    transformación, diff, índices y consultas de rango): un perfil activo
+    durante un await recogería todo lo que ejecuta el event loop. Al terminar
+    se escribe un fichero .prof (pstats) o .collapsed (flamegraph) en el
+    directorio de configuración.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        username: str,
+        mode: str = MODE_CPROFILE,
+        refreshes: int | None = None,
+        duration: float | None = None,
+    ) -> None:
+        self.hass = hass
+        self.username = username
+        self.mode = mode
+        self.refreshes_left = refreshes
+        self._duration = duration
+        self._active = 0
+        self._profile = cProfile.Profile() if mode == MODE_CPROFILE else None
+        self._sampler = _StackSampler(threading.get_ident()) if mode == MODE_SAMPLING else None
+        self._unsub_timer = None
+        self._started = dt_util.utcnow()
+        self.stopped = False
+        self.on_stop = None
+
+    @callback
+    def start(self) -> None:
+        if self._sampler is not None:
+            self._sampler.start()
+        if self._duration is not None:
+            self._unsub_timer = async_call_later(self.hass, self._duration, self._handle_timeout)
+        _LOGGER.info("Started %s profiling of Activo2 account %s", self.mode, self.username)
+
+    @contextmanager
+    def track(self):
+        """Perfila el bloque; los bloques solapados comparten el mismo perfil."""
+        if self.stopped:
+            yield
+            return
+        self._enter()
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def _enter(self) -> None:
+        self._active += 1
+        if self._active > 1:
+            return
+        if self._profile is not None:
+            try:
+                self._profile.enable()
+            except ValueError as err:
+                # Otro perfilador (p. ej. la integración profiler) ya está activo
+                _LOGGER.warning("Cannot profile Activo2 account %s: %s", self.username, err)
+        else:
+            self._sampler.active = 1
+
+    def _exit(self) -> None:
+        self._active -= 1
+        if self._active:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+        else:
+            self._sampler.active = 0
+
+    @callback
+    def refresh_done(self) -> None:
+        """Cuenta un refresco y termina la sesión al llegar al límite."""
+        if self.refreshes_left is None or self.stopped:
+            return
+        self.refreshes_left -= 1
+        if self.refreshes_left <= 0:
+            self.hass.async_create_task(self.async_stop())
+
+    async def _handle_timeout(self, _now) -> None:
+        self._unsub_timer = None
+        await self.async_stop()
+
+    async def async_stop(self) -> str | None:
+        """Detiene el perfilado y escribe el fichero; devuelve su ruta."""
+        if self.stopped:
+            return None
+        self.stopped = True
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if self._active:
+            self._active = 1
+            self._exit()
+        if self.on_stop is not None:
+            self.on_stop()
+
+        suffix = "prof" if self._profile is not None else "collapsed"
+        name = f"activo2_profile_{slugify(self.username)}_{self._started.strftime('%Y%m%d_%H%M%S')}.{suffix}"
+        path = self.hass.config.path(name)
+        await self.hass.async_add_executor_job(self._write, path)
+        _LOGGER.info("Activo2 profile for %s written to %s", self.username, path)
+        persistent_notification.async_create(
+            self.hass,
+            f"Perfil de Activo2 de {self.username} guardado en `{path}`.",
+            title="Activo2 profiler",
+        )
+        return path
+
+    def _write(self, path: str) -> None:
+        if self._profile is not None:
+            self._profile.dump_stats(path)
+            return
+        self._sampler.stop()
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self._sampler.samples.most_common():
+                file.write(f"{stack} {count}\n")
@@ -0,0 +1,107 @@
+"""Política adaptativa de refresco del calendario de Activo2."""
+from __future__ import annotations
+from datetime import datetime, timedelta
+import logging
+import random
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    CONF_SCAN_INTERVAL,
+    CONF_FAST_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_PUBLISH_WEEKDAY,
+    CONF_PUBLISH_START_HOUR,
+    CONF_PUBLISH_END_HOUR,
+    CONF_SHIFT_LEAD_TIME,
+    CONF_NIGHT_START_HOUR,
+    CONF_NIGHT_END_HOUR,
+    CONF_JITTER,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_FAST_INTERVAL,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_PUBLISH_WEEKDAY,
+    DEFAULT_PUBLISH_START_HOUR,
+    DEFAULT_PUBLISH_END_HOUR,
+    DEFAULT_SHIFT_LEAD_TIME,
+    DEFAULT_NIGHT_START_HOUR,
+    DEFAULT_NIGHT_END_HOUR,
+    DEFAULT_JITTER,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Número máximo de duplicaciones del intervalo cuando el calendario no cambia
+MAX_BACKOFF_STEPS = 4
+
+
+def _in_hour_window(hour: int, start: int, end: int) -> bool:
+    """Indica si la hora está en [start, end), admitiendo ventanas que cruzan medianoche."""
+    if start == end:
+        return False
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+class SchedulePolicy:
+    """Calcula el siguiente intervalo de refresco del calendario.
+
+    Refresca más a menudo cuando se suelen publicar las semanas nuevas y antes
+    de los próximos turnos, espacia los refrescos de madrugada y cuando el
+    calendario no cambia, y añade un desfase aleatorio por cuenta para que
+    no coincidan todas las cuentas tras reiniciar Home Assistant.
+    """
+
+    def __init__(self, options: dict, username: str) -> None:
+        self.scan_interval = timedelta(minutes=options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL))
+        self.fast_interval = timedelta(minutes=options.get(CONF_FAST_INTERVAL, DEFAULT_FAST_INTERVAL))
+        self.max_interval = timedelta(minutes=options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL))
+        self.publish_weekday = options.get(CONF_PUBLISH_WEEKDAY, DEFAULT_PUBLISH_WEEKDAY)
+        self.publish_start_hour = options.get(CONF_PUBLISH_START_HOUR, DEFAULT_PUBLISH_START_HOUR)
+        self.publish_end_hour = options.get(CONF_PUBLISH_END_HOUR, DEFAULT_PUBLISH_END_HOUR)
+        self.shift_lead_time = timedelta(minutes=options.get(CONF_SHIFT_LEAD_TIME, DEFAULT_SHIFT_LEAD_TIME))
+        self.night_start_hour = options.get(CONF_NIGHT_START_HOUR, DEFAULT_NIGHT_START_HOUR)
+        self.night_end_hour = options.get(CONF_NIGHT_END_HOUR, DEFAULT_NIGHT_END_HOUR)
+        self.jitter = timedelta(minutes=options.get(CONF_JITTER, DEFAULT_JITTER))
+        # Secuencia aleatoria propia de cada cuenta
+        self._random = random.Random(f"{DOMAIN}_{username}")
+
+    def in_publish_window(self, now: datetime) -> bool:
+        local = dt_util.as_local(now)
+        return local.weekday() == self.publish_weekday and _in_hour_window(
+            local.hour, self.publish_start_hour, self.publish_end_hour
+        )
+
+    def in_night_window(self, now: datetime) -> bool:
+        local = dt_util.as_local(now)
+        return _in_hour_window(local.hour, self.night_start_hour, self.night_end_hour)
+
+    def shift_is_near(self, now: datetime, workshifts: list) -> bool:
+        """Indica si algún turno empieza dentro del tiempo de antelación configurado."""
+        limit = now + self.shift_lead_time
+        for shift in workshifts:
+            if now <= shift.start <= limit:
+                return True
+        return False
+
+    def startup_delay(self) -> timedelta:
+        """Espera del primer refresco tras arrancar con datos guardados: cada
+        cuenta la suya, para que no llamen todas a la vez a la API."""
+        return timedelta(seconds=self._random.uniform(0, self.jitter.total_seconds()))
+
+    def next_interval(self, now: datetime, workshifts: list, unchanged_count: int) -> timedelta:
+        """Devuelve el intervalo hasta el próximo refresco del calendario."""
+        if self.in_publish_window(now) or self.shift_is_near(now, workshifts):
+            interval = self.fast_interval
+        elif self.in_night_window(now):
+            interval = self.max_interval
+        else:
+            backoff = 2 ** min(unchanged_count, MAX_BACKOFF_STEPS)
+            interval = min(self.scan_interval * backoff, self.max_interval)
+
+        jitter = self.jitter.total_seconds()
+        if jitter > 0:
+            interval += timedelta(seconds=self._random.uniform(0, jitter))
+        return interval
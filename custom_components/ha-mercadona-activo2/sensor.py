@@ -1,16 +1,32 @@
 """Plataforma sensor para la integración de Activo2 (información de usuario)."""
 from __future__ import annotations
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, datetime
 import logging
 from typing import Final
-from homeassistant.components.sensor import SensorEntity, SensorEntityDescription
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.helpers.event import async_track_point_in_utc_time, async_track_time_interval
+from homeassistant.util import dt as dt_util
 
 from .const import DOMAIN, SENSOR_PREFIX
-from .coordinator import Activo2Coordinator
-from .lib.userinfoDTO import UserDTO
+from .coordinator import Activo2Coordinator, get_user_timezone
+from .coverage import StoreCoverage, async_get_coverage
+from .entity import Activo2Entity
+from .hours import HoursTotals
+from .metrics import RefreshMetrics
+from .models import UserInfo
+from .photo import PICTURE_URL_REFRESH
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,6 +38,119 @@ SENSOR_TYPES_USERINFO: Final[tuple[SensorEntityDescription, ...]] = (
     ),
 )
 
+
+@dataclass(frozen=True, kw_only=True)
+class Activo2MetricSensorEntityDescription(SensorEntityDescription):
+    """Sensor de diagnóstico con una métrica de los refrescos."""
+
+    value_fn: Callable[[RefreshMetrics], float | int | None]
+
+
+def _duration(phase: str) -> Callable[[RefreshMetrics], float | None]:
+    """Última duración de una fase en milisegundos."""
+    def value(metrics: RefreshMetrics) -> float | None:
+        seconds = metrics.timings.get(phase)
+        return None if seconds is None else round(seconds * 1000, 1)
+    return value
+
+
+def _duration_sensor(key: str, name: str, phase: str, enabled: bool = True) -> Activo2MetricSensorEntityDescription:
+    return Activo2MetricSensorEntityDescription(
+        key=key,
+        name=name,
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        suggested_display_precision=0,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=enabled,
+        value_fn=_duration(phase),
+    )
+
+
+SENSOR_TYPES_METRICS: Final[tuple[Activo2MetricSensorEntityDescription, ...]] = (
+    _duration_sensor("refresh_duration", "Refresh Duration", "total"),
+    _duration_sensor("login_duration", "Login Duration", "login", enabled=False),
+    _duration_sensor("userinfo_duration", "User Info Duration", "userinfo", enabled=False),
+    _duration_sensor("schedule_download_duration", "Schedule Download Duration", "schedule_download"),
+    _duration_sensor("schedule_parse_duration", "Schedule Parse Duration", "schedule_parse"),
+    _duration_sensor("transform_duration", "Transform Duration", "transform"),
+    _duration_sensor("diff_duration", "Diff Duration", "diff", enabled=False),
+    Activo2MetricSensorEntityDescription(
+        key="schedule_size",
+        name="Schedule Size",
+        icon="mdi:download-network-outline",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda metrics: metrics.sizes.get("schedule_bytes"),
+    ),
+    Activo2MetricSensorEntityDescription(
+        key="workshift_count",
+        name="Workshift Count",
+        icon="mdi:calendar-account",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.counts.get("workshifts"),
+    ),
+    Activo2MetricSensorEntityDescription(
+        key="task_count",
+        name="Task Count",
+        icon="mdi:format-list-checks",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda metrics: metrics.counts.get("tasks"),
+    ),
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class Activo2HoursSensorEntityDescription(SensorEntityDescription):
+    """Sensor con un total del periodo actual, que se reinicia al empezar el siguiente."""
+
+    value_fn: Callable[[HoursTotals], float | int]
+    period_start_fn: Callable[[HoursTotals], date]
+
+
+def _hours_sensor(key: str, name: str, value_fn, period_start_fn) -> Activo2HoursSensorEntityDescription:
+    return Activo2HoursSensorEntityDescription(
+        key=key,
+        name=name,
+        icon="mdi:briefcase-clock-outline",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement=UnitOfTime.HOURS,
+        suggested_display_precision=1,
+        value_fn=value_fn,
+        period_start_fn=period_start_fn,
+    )
+
+
+def _night_shifts_sensor(key: str, name: str, value_fn, period_start_fn) -> Activo2HoursSensorEntityDescription:
+    return Activo2HoursSensorEntityDescription(
+        key=key,
+        name=name,
+        icon="mdi:weather-night",
+        state_class=SensorStateClass.TOTAL,
+        value_fn=value_fn,
+        period_start_fn=period_start_fn,
+    )
+
+
+SENSOR_TYPES_HOURS: Final[tuple[Activo2HoursSensorEntityDescription, ...]] = (
+    _hours_sensor("week_hours", "Week Hours", lambda t: t.week_hours, lambda t: t.week_start),
+    _hours_sensor("month_hours", "Month Hours", lambda t: t.month_hours, lambda t: t.month_start),
+    _hours_sensor("year_hours", "Year Hours", lambda t: t.year_hours, lambda t: t.year_start),
+    _night_shifts_sensor("week_night_shifts", "Week Night Shifts", lambda t: t.week_night_shifts, lambda t: t.week_start),
+    _night_shifts_sensor("month_night_shifts", "Month Night Shifts", lambda t: t.month_night_shifts, lambda t: t.month_start),
+    _night_shifts_sensor("year_night_shifts", "Year Night Shifts", lambda t: t.year_night_shifts, lambda t: t.year_start),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -29,15 +158,27 @@ async def async_setup_entry(
 ) -> None:
     """Configura los sensores de información de usuario."""
     coordinator: Activo2Coordinator = hass.data[DOMAIN][entry.entry_id]
-    user_info : UserDTO = coordinator.data["userinfo"]
+    user_info : UserInfo = coordinator.data["userinfo"]
 
     entities = []
     for description in SENSOR_TYPES_USERINFO:
         entities.append(Activo2UserInfoEntity(coordinator, description, user_info.userid))
+    for description in SENSOR_TYPES_HOURS:
+        entities.append(Activo2HoursSensorEntity(coordinator, description, user_info.userid))
+    for description in SENSOR_TYPES_METRICS:
+        entities.append(Activo2MetricSensorEntity(coordinator, description, user_info.userid))
     async_add_entities(entities)
 
-class Activo2UserInfoEntity(CoordinatorEntity, SensorEntity):
+    # Personal en turno en la tienda: lo crea una sola de las cuentas de la tienda
+    coverage = async_get_coverage(hass, user_info.cod_store)
+    coverage.async_add_platform(
+        "sensor", entry.entry_id, async_add_entities, Activo2StoreHeadcountSensorEntity
+    )
+
+class Activo2UserInfoEntity(Activo2Entity, SensorEntity):
     """Representa un sensor con la información del usuario de Activo2."""
+    _data_keys = ("userinfo", "photo", "stale")
+
     def __init__(
         self,
         coordinator: Activo2Coordinator,
@@ -59,14 +200,25 @@ class Activo2UserInfoEntity(CoordinatorEntity, SensorEntity):
     def native_value(self):
         if not self.available:
             return None
-        user_info : UserDTO = self.coordinator.data["userinfo"]
+        user_info : UserInfo = self.coordinator.data["userinfo"]
         return f"{user_info.name} {user_info.lastname}"
 
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # La URL firmada del entity_picture caduca: se reescribe el estado antes
+        self.async_on_remove(async_track_time_interval(
+            self.hass, self._handle_picture_refresh, PICTURE_URL_REFRESH
+        ))
+
+    @callback
+    def _handle_picture_refresh(self, _now) -> None:
+        self.async_write_ha_state()
+
     @property
     def entity_picture(self):
+        # Miniatura local cacheable en lugar de la URL remota de la foto
         if self.available:
-            user_info: UserDTO = self.coordinator.data["userinfo"]
-            return user_info.photo
+            return self.coordinator.photo.picture_url()
         return None
 
     @property
@@ -74,14 +226,7 @@ class Activo2UserInfoEntity(CoordinatorEntity, SensorEntity):
         if not self.available:
             return None
 
-        user_info: UserDTO = self.coordinator.data["userinfo"]
-        employee_number = None
-        if hasattr(user_info, "companies") and user_info.companies:
-            for company in user_info.companies:
-                if company.active:
-                    employee_number = company.employee_number
-                    break
-
+        user_info: UserInfo = self.coordinator.data["userinfo"]
         return {
             "userid": user_info.userid,
             "name": user_info.name,
@@ -94,5 +239,144 @@ class Activo2UserInfoEntity(CoordinatorEntity, SensorEntity):
             "division_zone": user_info.division_zone,
             "cod_store": user_info.cod_store,
             "store": user_info.store,
-            "employee_number": employee_number,
+            "employee_number": user_info.employee_number,
+            "stale": self.coordinator.data.get("stale", False),
+        }
+
+
+class Activo2HoursSensorEntity(Activo2Entity, SensorEntity):
+    """Horas o turnos de noche de la semana, el mes o el año en curso.
+
+    La semana y el mes incluyen lo planificado; el año suma hasta hoy.
+    """
+    entity_description: Activo2HoursSensorEntityDescription
+    _data_keys = ("hours",)
+
+    def __init__(
+        self,
+        coordinator: Activo2Coordinator,
+        description: Activo2HoursSensorEntityDescription,
+        userid: str,
+    ) -> None:
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{SENSOR_PREFIX} {userid} {description.name}"
+        self._attr_unique_id = f"{SENSOR_PREFIX}_{userid}_{description.key}"
+
+    @property
+    def available(self) -> bool:
+        return (
+            self.coordinator.last_update_success
+            and self.coordinator.data is not None
+            and "hours" in self.coordinator.data
+        )
+
+    @property
+    def native_value(self):
+        if not self.available:
+            return None
+        return self.entity_description.value_fn(self.coordinator.data["hours"])
+
+    @property
+    def last_reset(self) -> datetime | None:
+        if not self.available:
+            return None
+        totals: HoursTotals = self.coordinator.data["hours"]
+        timezone = get_user_timezone(self.coordinator.data["userinfo"].cod_company)
+        return datetime.combine(self.entity_description.period_start_fn(totals), datetime.min.time(), timezone)
+
+
+class Activo2MetricSensorEntity(Activo2Entity, SensorEntity):
+    """Sensor de diagnóstico con la duración de una fase del refresco, el
+    tamaño de la respuesta o el número de eventos."""
+    entity_description: Activo2MetricSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: Activo2Coordinator,
+        description: Activo2MetricSensorEntityDescription,
+        userid: str,
+    ) -> None:
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{SENSOR_PREFIX} {userid} {description.name}"
+        self._attr_unique_id = f"{SENSOR_PREFIX}_{userid}_{description.key}"
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # Las métricas cambian en cada refresco, aunque los datos sean los mismos
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, self.coordinator.metrics_signal, self._handle_metrics_update)
+        )
+
+    @callback
+    def _handle_metrics_update(self) -> None:
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        # También hay métricas de los refrescos que fallan
+        return self.native_value is not None
+
+    @property
+    def native_value(self):
+        return self.entity_description.value_fn(self.coordinator.metrics)
+
+
+class Activo2StoreHeadcountSensorEntity(SensorEntity):
+    """Número de personas en turno ahora mismo en una tienda, sumando las cuentas
+    configuradas de esa tienda."""
+
+    _attr_should_poll = False
+    _attr_icon = "mdi:account-group"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coverage: StoreCoverage) -> None:
+        self._coverage = coverage
+        self._attr_name = f"{SENSOR_PREFIX} store {coverage.cod_store} Headcount"
+        self._attr_unique_id = f"{SENSOR_PREFIX}_store_{coverage.cod_store}_headcount"
+        self._on_shift: frozenset[str] = frozenset()
+        self._unsub_boundary = None
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self._coverage.async_add_listener(self._handle_coverage_update))
+        self.async_on_remove(self._cancel_boundary)
+        self._update_on_shift()
+
+    @callback
+    def _cancel_boundary(self) -> None:
+        if self._unsub_boundary is not None:
+            self._unsub_boundary()
+            self._unsub_boundary = None
+
+    @callback
+    def _update_on_shift(self) -> None:
+        """Cuentas en turno ahora y actualización en la siguiente frontera."""
+        self._on_shift, boundary = self._coverage.at(dt_util.utcnow())
+        self._cancel_boundary()
+        if boundary is not None:
+            self._unsub_boundary = async_track_point_in_utc_time(self.hass, self._handle_boundary, boundary)
+
+    @callback
+    def _handle_boundary(self, _now) -> None:
+        self._unsub_boundary = None
+        self._update_on_shift()
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_coverage_update(self) -> None:
+        self._update_on_shift()
+        self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> int:
+        return len(self._on_shift)
+
+    @property
+    def extra_state_attributes(self):
+        names = self._coverage.names
+        return {
+            "cod_store": self._coverage.cod_store,
+            "on_shift": sorted(names.get(user, user) for user in self._on_shift),
+            "members": self._coverage.members,
         }
\ No newline at end of file
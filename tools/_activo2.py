@@ -0,0 +1,31 @@
+"""Carga el paquete lib de la integración sin añadir su carpeta a sys.path
+(su calendar.py taparía el módulo calendar de la librería estándar)."""
+import importlib.util
+import os
+import sys
+
+INTEGRATION_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "custom_components", "ha-mercadona-activo2"
+)
+
+
+def _load_package(name: str, path: str):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(path, "__init__.py"), submodule_search_locations=[path]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_lib(name: str = "activo2_lib"):
+    """Importa custom_components/ha-mercadona-activo2/lib como el paquete name."""
+    return _load_package(name, os.path.join(INTEGRATION_DIR, "lib"))
+
+
+def load_integration(name: str = "activo2"):
+    """Importa la integración completa como el paquete name (requiere homeassistant)."""
+    return _load_package(name, INTEGRATION_DIR)
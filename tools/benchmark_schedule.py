@@ -0,0 +1,34 @@
+"""Compara el parseo del calendario actual (json + ScheduleResponse) con el
+nuevo (TypeAdapter.validate_json sobre el DTO reducido).
+
+Uso: python tools/benchmark_schedule.py [semanas] [tareas_por_dia]
+"""
+import json
+import sys
+import timeit
+
+from _activo2 import load_lib
+from schedule_fixtures import generate_schedule_bytes
+
+load_lib()
+from activo2_lib.scheduleDTO import ScheduleResponse, parse_schedule  # noqa: E402
+
+
+def current_path(body: bytes):
+    return ScheduleResponse(**json.loads(body))
+
+
+def main() -> None:
+    weeks = int(sys.argv[1]) if len(sys.argv) > 1 else 26
+    tasks_per_day = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    body = generate_schedule_bytes(weeks=weeks, tasks_per_day=tasks_per_day)
+    print(f"Payload: {weeks} weeks, {tasks_per_day} tasks/day, {len(body) / 1024:.0f} KiB")
+
+    for name, func in (("json + ScheduleResponse", current_path), ("validate_json lean", parse_schedule)):
+        number = 20
+        best = min(timeit.repeat(lambda: func(body), number=number, repeat=5)) / number
+        print(f"{name:<26} {best * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
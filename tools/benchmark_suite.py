@@ -0,0 +1,147 @@
+"""Benchmarks de las rutas calientes de la integración sobre calendarios
+sintéticos de distintos tamaños: validación del DTO, transformación del
+coordinador, consultas de rango de los calendarios y native_event.
+
+Requiere homeassistant instalado. Uso:
+    python tools/benchmark_suite.py [--weeks 1,4,26,52] [--tasks 10] [--json salida.json]
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+from bisect import bisect_right
+from datetime import timedelta
+import json
+import tempfile
+import time
+
+from _activo2 import load_integration
+from schedule_fixtures import generate_schedule_bytes
+
+integration = load_integration()
+from activo2.calendar import Activo2TasksCalendarEntity, Activo2WorkshiftCalendarEntity  # noqa: E402
+from activo2.coordinator import Activo2Coordinator, get_user_timezone  # noqa: E402
+from activo2.lib.scheduleDTO import parse_schedule  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+
+def measure(func, min_time: float = 0.2) -> float:
+    """Mejor tiempo por llamada (segundos) de varias tandas de al menos min_time."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(4):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+async def ameasure(factory, min_time: float = 0.2) -> float:
+    """Como measure() para corrutinas."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            await factory()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(4):
+        start = time.perf_counter()
+        for _ in range(number):
+            await factory()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def check_tasks_in_shifts(workshifts, tasks) -> None:
+    """Cada tarea cae dentro de un turno (también en los de noche)."""
+    shifts = sorted(workshifts, key=lambda event: event.start)
+    starts = [event.start for event in shifts]
+    for task in tasks:
+        position = bisect_right(starts, task.start) - 1
+        if position < 0 or task.end > shifts[position].end:
+            raise AssertionError(f"Task {task.uid} {task.start}-{task.end} outside its workshift")
+
+
+async def run(weeks_list: list[int], tasks_per_day: int) -> list[dict]:
+    hass = HomeAssistant(tempfile.mkdtemp())
+    coordinator = Activo2Coordinator(hass, "benchmark", "secret")
+    timezone = get_user_timezone("08")
+    results = []
+
+    for weeks in weeks_list:
+        body = generate_schedule_bytes(weeks=weeks, tasks_per_day=tasks_per_day)
+        schedule = parse_schedule(body)
+        workshifts, tasks = Activo2Coordinator._transform_schedule(schedule, timezone)
+        check_tasks_in_shifts(workshifts, tasks)
+        coordinator.data = {"userinfo": None, "workshifts": workshifts, "tasks": tasks, "stale": False}
+        coordinator.last_update_success = True
+
+        shifts_entity = Activo2WorkshiftCalendarEntity(coordinator, "benchmark")
+        tasks_entity = Activo2TasksCalendarEntity(coordinator, "benchmark")
+        first = min(event.start for event in workshifts)
+        week_range = (first + timedelta(weeks=weeks // 2), first + timedelta(weeks=weeks // 2 + 1))
+        month_range = (first, first + timedelta(days=31))
+
+        def uncached_native_event(entity):
+            entity._cached_index = None
+            return entity.native_event
+
+        row = {
+            "weeks": weeks,
+            "payload_kib": round(len(body) / 1024, 1),
+            "workshifts": len(workshifts),
+            "tasks": len(tasks),
+            "validate_ms": measure(lambda: parse_schedule(body)) * 1000,
+            "transform_ms": measure(lambda: Activo2Coordinator._transform_schedule(schedule, timezone)) * 1000,
+            "index_build_ms": measure(lambda: type(coordinator.event_index("tasks"))(tasks)) * 1000,
+        }
+
+        for label, entity in (("workshifts", shifts_entity), ("tasks", tasks_entity)):
+            for span_label, (start, end) in (("week", week_range), ("month", month_range)):
+                row[f"{label}_{span_label}_query_us"] = await ameasure(
+                    lambda: entity.async_get_events(hass, start, end)
+                ) * 1e6
+            row[f"{label}_native_event_uncached_us"] = measure(lambda: uncached_native_event(entity)) * 1e6
+            entity.native_event
+            row[f"{label}_native_event_cached_us"] = measure(lambda: entity.native_event) * 1e6
+
+        results.append(row)
+
+    await hass.async_stop(force=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", default="1,4,26,52", help="tamaños del calendario en semanas")
+    parser.add_argument("--tasks", type=int, default=10, help="tareas por día")
+    parser.add_argument("--json", help="guardar los resultados en este fichero")
+    args = parser.parse_args()
+
+    results = asyncio.run(run([int(w) for w in args.weeks.split(",")], args.tasks))
+    keys = list(results[0])
+    width = max(len(key) for key in keys)
+    for key in keys:
+        values = "".join(
+            f"{row[key]:>12.2f}" if isinstance(row[key], float) else f"{row[key]:>12}" for row in results
+        )
+        print(f"{key:<{width}} {values}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
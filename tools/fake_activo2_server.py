@@ -0,0 +1,203 @@
+"""Servidor aiohttp que imita el STS de Mercadona y la API de Activo2.
+
+Permite inyectar latencia, errores 5xx, 401 aleatorios y tokens de vida corta
+para probar la integración sin llamar a Mercadona. Uso independiente:
+    python tools/fake_activo2_server.py --port 8080 --latency 50 --error-rate 0.05
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import base64
+from collections import Counter
+from dataclasses import dataclass
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+from schedule_fixtures import generate_schedule_bytes, generate_userinfo
+
+TOKEN_PATH = "/adfs/oauth2/token/"
+USERINFO_PATH = "/user/info"
+SCHEDULE_PATH = "/mot/v2/schedule"
+PHOTO_PATH = "/photos/{username}.jpg"
+
+
+@dataclass
+class FakeServerConfig:
+    latency_ms: float = 20.0
+    latency_jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    unauthorized_rate: float = 0.0
+    token_lifetime: int = 3600
+    weeks: int = 8
+    tasks_per_day: int = 8
+    etag: bool = False
+    seed: int = 0
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def make_token(username: str, lifetime: int) -> str:
+    """JWT sin firmar con sub y exp, suficiente para la integración."""
+    header = _b64(json.dumps({"alg": "none", "typ": "JWT"}).encode())
+    payload = _b64(json.dumps({"sub": username, "exp": int(time.time()) + lifetime}).encode())
+    return f"{header}.{payload}.fake"
+
+
+def read_token(token: str) -> dict | None:
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return None
+
+
+class FakeActivo2Server:
+    """Aplicación aiohttp con los tres endpoints y contadores de peticiones."""
+
+    def __init__(self, config: FakeServerConfig | None = None) -> None:
+        self.config = config or FakeServerConfig()
+        self.requests: Counter[str] = Counter()
+        self._random = random.Random(self.config.seed)
+        self._schedules: dict[str, bytes] = {}
+        self.app = web.Application()
+        self.app.router.add_post(TOKEN_PATH, self._token)
+        self.app.router.add_post(USERINFO_PATH, self._userinfo)
+        self.app.router.add_get(SCHEDULE_PATH, self._schedule)
+        self.app.router.add_get(PHOTO_PATH, self._photo)
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _delay_or_fail(self, endpoint: str) -> web.Response | None:
+        config = self.config
+        delay = max(0.0, self._random.gauss(config.latency_ms, config.latency_jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if self._random.random() < config.error_rate:
+            self.requests[f"{endpoint} 503"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+        return None
+
+    def _authorize(self, request: web.Request, endpoint: str) -> str | web.Response:
+        auth = request.headers.get("Authorization", "")
+        claims = read_token(auth.removeprefix("Bearer "))
+        if (
+            claims is None
+            or claims.get("exp", 0) < time.time()
+            or self._random.random() < self.config.unauthorized_rate
+        ):
+            self.requests[f"{endpoint} 401"] += 1
+            return web.Response(status=401, text="Unauthorized")
+        return claims["sub"]
+
+    async def _token(self, request: web.Request) -> web.Response:
+        if (error := await self._delay_or_fail("token")) is not None:
+            return error
+        form = await request.post()
+        username = str(form.get("username", "")).split("\\")[-1]
+        if not username or form.get("password") == "wrong":
+            self.requests["token 400"] += 1
+            return web.json_response({"error": "invalid_grant"}, status=400)
+        self.requests["token 200"] += 1
+        return web.json_response({"id_token": make_token(username, self.config.token_lifetime)})
+
+    async def _userinfo(self, request: web.Request) -> web.Response:
+        if (error := await self._delay_or_fail("userinfo")) is not None:
+            return error
+        username = self._authorize(request, "userinfo")
+        if isinstance(username, web.Response):
+            return username
+        self.requests["userinfo 200"] += 1
+        userinfo = generate_userinfo(username)
+        userinfo["photo"] = f"{self.url}{PHOTO_PATH.format(username=username)}"
+        return web.json_response(userinfo)
+
+    async def _photo(self, request: web.Request) -> web.Response:
+        if (error := await self._delay_or_fail("photo")) is not None:
+            return error
+        # Bytes de relleno: sin Pillow la integración guarda la foto tal cual
+        body = hashlib.sha256(request.match_info["username"].encode()).digest() * 64
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.requests["photo 304"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        self.requests["photo 200"] += 1
+        return web.Response(body=body, content_type="image/jpeg", headers={"ETag": etag})
+
+    async def _schedule(self, request: web.Request) -> web.Response:
+        if (error := await self._delay_or_fail("schedule")) is not None:
+            return error
+        username = self._authorize(request, "schedule")
+        if isinstance(username, web.Response):
+            return username
+        body = self._schedules.get(username)
+        if body is None:
+            seed = int(hashlib.sha1(username.encode()).hexdigest()[:8], 16)
+            body = self._schedules[username] = generate_schedule_bytes(
+                weeks=self.config.weeks, tasks_per_day=self.config.tasks_per_day, seed=seed
+            )
+        headers = {}
+        if self.config.etag:
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            headers["ETag"] = etag
+            if request.headers.get("If-None-Match") == etag:
+                self.requests["schedule 304"] += 1
+                return web.Response(status=304, headers=headers)
+        self.requests["schedule 200"] += 1
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=20.0, help="latencia media (ms)")
+    parser.add_argument("--jitter", type=float, default=10.0, help="desviación de la latencia (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proporción de respuestas 503")
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0, help="proporción de 401 aleatorios")
+    parser.add_argument("--token-lifetime", type=int, default=3600, help="vida del id_token (s)")
+    parser.add_argument("--weeks", type=int, default=8, help="semanas de calendario por usuario")
+    parser.add_argument("--tasks", type=int, default=8, help="tareas por día")
+    parser.add_argument("--etag", action="store_true", help="enviar ETag y responder 304")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeServerConfig:
+    return FakeServerConfig(
+        latency_ms=args.latency,
+        latency_jitter_ms=args.jitter,
+        error_rate=args.error_rate,
+        unauthorized_rate=args.unauthorized_rate,
+        token_lifetime=args.token_lifetime,
+        weeks=args.weeks,
+        tasks_per_day=args.tasks,
+        etag=args.etag,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = FakeActivo2Server(config_from_args(args))
+    web.run_app(server.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
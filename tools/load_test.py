@@ -0,0 +1,93 @@
+"""Prueba de carga: N coordinadores contra el servidor falso de Activo2.
+
+Lanza FakeActivo2Server en el mismo proceso, crea N cuentas que comparten el
+cliente HTTP de la integración y ejecuta varias rondas de refresco
+simultáneo. Informa de la latencia p50/p99 por refresco, las peticiones
+recibidas por el servidor y el pico de memoria. Requiere homeassistant.
+    python tools/load_test.py --accounts 40 --rounds 5 --error-rate 0.05 --etag
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from _activo2 import load_integration
+from fake_activo2_server import FakeActivo2Server, add_config_arguments, config_from_args
+
+load_integration()
+from activo2.client import Activo2Client  # noqa: E402
+from activo2.coordinator import Activo2Coordinator  # noqa: E402
+# Mismo percentil que los diagnósticos de la integración
+from activo2.metrics import _percentile as percentile  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+
+async def timed_refresh(coordinator: Activo2Coordinator) -> tuple[float, bool]:
+    start = time.perf_counter()
+    await coordinator.async_refresh()
+    return time.perf_counter() - start, coordinator.last_update_success
+
+
+async def run(args: argparse.Namespace) -> None:
+    server = FakeActivo2Server(config_from_args(args))
+    url = await server.start()
+    hass = HomeAssistant(tempfile.mkdtemp())
+    client = Activo2Client(hass, sts_base_url=url, api_base_url=url)
+    coordinators = [
+        Activo2Coordinator(hass, f"{10000000 + i}", "secret", client=client)
+        for i in range(args.accounts)
+    ]
+
+    tracemalloc.start()
+    latencies: list[float] = []
+    failures = 0
+    started = time.perf_counter()
+    for round_number in range(args.rounds):
+        results = await asyncio.gather(*(timed_refresh(c) for c in coordinators))
+        latencies.extend(latency for latency, _ in results)
+        failures += sum(1 for _, ok in results if not ok)
+        if args.interval and round_number + 1 < args.rounds:
+            await asyncio.sleep(args.interval)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    refreshes = len(latencies)
+    latencies.sort()
+    print(f"Accounts: {args.accounts}  rounds: {args.rounds}  refreshes: {refreshes}  failed: {failures}")
+    print(f"Wall time: {elapsed:.2f} s")
+    print(
+        f"Refresh latency: p50 {percentile(latencies, 50) * 1000:.1f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} ms  "
+        f"mean {statistics.fmean(latencies) * 1000:.1f} ms"
+    )
+    print("Server requests:")
+    for key, count in sorted(server.requests.items()):
+        print(f"  {key:<16} {count}")
+    print(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+    print(f"Max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+    await client.async_close()
+    await server.stop()
+    await hass.async_stop(force=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=20, help="número de cuentas")
+    parser.add_argument("--rounds", type=int, default=3, help="rondas de refresco")
+    parser.add_argument("--interval", type=float, default=0.0, help="pausa entre rondas (s)")
+    parser.add_argument("--log-level", default="critical", help="nivel de log de la integración")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Generador de respuestas sintéticas de la API de Activo2 para benchmarks y
+pruebas de carga: calendarios de una semana a un año, con muchas tareas por
+día y turnos de noche que cruzan la medianoche."""
+from __future__ import annotations
+from datetime import date, timedelta
+import json
+import random
+
+STORES = [("1234", "Valencia Centro"), ("2345", "Alboraya"), ("3456", "Paterna")]
+COLOURS = ["#00aa00", "#0055ff", "#ff8800", "#aa00aa", None]
+PROCESSES = [
+    ("REP", "Reposición", "Reposición de lineales"),
+    ("CAJ", "Caja", "Atención en caja"),
+    ("FRU", "Fruta", "Sección de fruta y verdura"),
+    ("PAN", "Horno", "Sección de horno"),
+    ("LIM", "Limpieza", "Limpieza de sala"),
+    ("REC", "Recepción", "Recepción de mercancía"),
+]
+DAY_TYPE_WORK = {"ids": ["1"], "name": "Laborable", "primaryColour": "#ffffff", "secondaryColour": "#000000", "isWorkingDay": True}
+DAY_TYPE_OFF = {"ids": ["2"], "name": "Libre", "primaryColour": "#eeeeee", "secondaryColour": None, "isWorkingDay": False}
+
+
+def _hour(minutes: int) -> str:
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _day(day: date, rng: random.Random, tasks_per_day: int, night_shift_ratio: float) -> dict:
+    working = day.weekday() < 6 and rng.random() > 0.15
+    detail = []
+    if working:
+        code, name = STORES[rng.randrange(len(STORES))]
+        night = rng.random() < night_shift_ratio
+        start = (22 * 60) if night else rng.choice((6 * 60, 7 * 60, 14 * 60))
+        length = 8 * 60
+        slot = max(length // max(tasks_per_day, 1), 5)
+        tasks = []
+        for i in range(tasks_per_day):
+            abbreviation, task_name, description = PROCESSES[rng.randrange(len(PROCESSES))]
+            task_start = start + i * slot
+            tasks.append({
+                "processId": f"{abbreviation}{i:02d}",
+                "colour": rng.choice(COLOURS),
+                "name": task_name,
+                "description": description,
+                "shortDescription": task_name,
+                "abbreviation": abbreviation,
+                "priority": str(rng.randint(1, 3)),
+                "startHour": _hour(task_start),
+                "endHour": _hour(task_start + slot),
+            })
+        detail.append({
+            "store": {"codeLabel": code, "name": name},
+            "schedule": {
+                "start": _hour(start),
+                "end": _hour(start + length),
+                "total": "8",
+                "nightShift": night,
+                "nightShiftLabel": "Nocturno" if night else "",
+            },
+            "taskList": tasks,
+        })
+    return {
+        "dayLabel": f"{day.day:02d}",
+        "date": day.isoformat(),
+        "dayName": day.strftime("%A"),
+        "dayType": DAY_TYPE_WORK if working else DAY_TYPE_OFF,
+        "hasTasks": working,
+        "detail": detail,
+    }
+
+
+def generate_schedule(
+    weeks: int = 4,
+    tasks_per_day: int = 8,
+    night_shift_ratio: float = 0.1,
+    start: date | None = None,
+    seed: int = 0,
+) -> dict:
+    """Respuesta del endpoint de calendario con weeks semanas desde start (lunes)."""
+    rng = random.Random(seed)
+    if start is None:
+        today = date.today()
+        start = today - timedelta(days=today.weekday())
+    months: dict[tuple[int, int], list] = {}
+    for w in range(weeks):
+        monday = start + timedelta(weeks=w)
+        days = [_day(monday + timedelta(days=d), rng, tasks_per_day, night_shift_ratio) for d in range(7)]
+        hours = sum(8 for day in days if day["hasTasks"])
+        week = {
+            "weekLabel": f"Semana {monday.isocalendar()[1]}",
+            "weekNumber": str(monday.isocalendar()[1]),
+            "totalHours": f"{hours}:00",
+            "days": days,
+        }
+        months.setdefault((monday.year, monday.month), []).append(week)
+    return {
+        "startMonday": True,
+        "months": [
+            {"yearLabel": str(year), "monthLabel": f"{month:02d}", "monthNumber": str(month), "weeks": month_weeks}
+            for (year, month), month_weeks in months.items()
+        ],
+    }
+
+
+def generate_schedule_bytes(**kwargs) -> bytes:
+    return json.dumps(generate_schedule(**kwargs)).encode()
+
+
+def generate_userinfo(username: str = "12345678", cod_company: str = "08", cod_store: str = "1234") -> dict:
+    """Respuesta del endpoint de información de usuario."""
+    return {
+        "userid": username,
+        "name": "Nombre",
+        "lastname": f"Apellido {username}",
+        "email": f"{username}@example.com",
+        "alias": username,
+        "photo": f"https://example.com/photos/{username}.jpg",
+        "is_new_employee": False,
+        "company": "Mercadona",
+        "cod_company": cod_company,
+        "cod_department": "01",
+        "department": "Tienda",
+        "cod_division_zone": "01",
+        "division_zone": "Levante",
+        "cod_store": cod_store,
+        "store": "Valencia Centro",
+        "cod_region": "01",
+        "region": "Valencia",
+        "companies": [{"code": cod_company, "name": "Mercadona", "employee_number": username, "active": True}],
+        "language_code": "es",
+        "language_name": "Español",
+        "language_country": "ES",
+        "external": False,
+        "acceptLegal": True,
+        "legalConditionsType": "A",
+        "internal_user_id": username,
+        "hasEverAcceptedLegal": True,
+        "city": "Valencia",
+        "cod_city": "46250",
+        "cod_province": "46",
+        "province": "Valencia",
+        "banned": False,
+    }